@@ -0,0 +1,112 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+QUEUE_TIME = Histogram(
+    "admission_queue_seconds",
+    "Time a request waited for a compute slot",
+    buckets=(0, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5),
+)
+COALESCED = Counter(
+    "admission_coalesced_total", "Requests served by an identical in-flight request"
+)
+REJECTED = Counter("admission_rejected_total", "Requests shed with 503", ["reason"])
+IN_FLIGHT = Gauge("admission_in_flight", "Requests holding a compute slot")
+QUEUE_DEPTH = Gauge("admission_queue_depth", "Requests waiting for a compute slot")
+
+
+class Overloaded(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Server overloaded ({reason}), retry in {retry_after:g}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Limit concurrent work to max_concurrent, with a bounded FIFO wait queue.
+
+    A request that finds max_queue others waiting, or waits longer than
+    max_wait seconds, is rejected with Overloaded instead of adding latency
+    for everyone behind it. Runs on the event loop, so waiting requests do
+    not hold threadpool threads.
+    """
+
+    def __init__(self, max_concurrent, max_queue, max_wait, retry_after=1):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self.active = 0
+        self._waiters = deque()
+
+    def _reject(self, reason):
+        REJECTED.labels(reason).inc()
+        raise Overloaded(reason, self.retry_after)
+
+    async def _acquire(self):
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        QUEUE_DEPTH.set(len(self._waiters))
+        try:
+            # _release hands its slot straight to the waiter (active unchanged)
+            await asyncio.wait_for(waiter, self.max_wait)
+        except asyncio.TimeoutError:
+            self._reject("timeout")
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            QUEUE_DEPTH.set(len(self._waiters))
+
+    def _release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                QUEUE_DEPTH.set(len(self._waiters))
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def admit(self):
+        start = time.monotonic()
+        await self._acquire()
+        QUEUE_TIME.observe(time.monotonic() - start)
+        IN_FLIGHT.set(self.active)
+        try:
+            yield
+        finally:
+            self._release()
+            IN_FLIGHT.set(self.active)
+
+
+class Coalescer:
+    """
+    Share one computation between identical concurrent requests.
+
+    The first request for a key starts fn(*args); requests arriving while it
+    runs await the same result (or exception). The shared task is shielded,
+    so a disconnecting client does not cancel the others' result.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+
+    async def run(self, key, fn, *args):
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            COALESCED.inc()
+        return await asyncio.shield(task)
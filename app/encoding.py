@@ -0,0 +1,115 @@
+import msgpack
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+JSON = "application/json"
+ARROW = "application/vnd.apache.arrow.stream"
+MSGPACK = "application/msgpack"
+
+SUPPORTED = [JSON, ARROW, MSGPACK]
+
+# Open-Meteo is queried with timezone=Asia/Dhaka: forecast timestamps are naive
+# wall-clock times in this zone.
+FORECAST_TIMEZONE = "Asia/Dhaka"
+
+
+def negotiate(accept):
+    """
+    Pick the response media type for an Accept header (JSON by default).
+
+    Returns None when the client accepts none of the supported types.
+    """
+    if not accept:
+        return JSON
+
+    candidates = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            candidates.append((-q, position, media_type.lower()))
+
+    for _, _, media_type in sorted(candidates):
+        if media_type in SUPPORTED:
+            return media_type
+        if media_type in ("*/*", "application/*"):
+            return JSON
+    return None
+
+
+def to_records(forecast):
+    """
+    Format a columnar forecast as the list of records returned by /predict.
+    """
+    df = pd.DataFrame(
+        {
+            "timestamp": pd.to_datetime(forecast["timestamp"]),
+            "predicted_precipitation": forecast["predicted_precipitation"],
+        }
+    )
+
+    # Add unit
+    df["unit"] = "mm"
+
+    return df.to_dict(orient="records")
+
+
+def localized(timestamps):
+    """
+    Attach FORECAST_TIMEZONE to naive forecast timestamps.
+    """
+    return pd.DatetimeIndex(timestamps).tz_localize(FORECAST_TIMEZONE)
+
+
+def encode_arrow(forecast, unit="mm"):
+    """
+    Encode a columnar forecast as an Arrow IPC stream; the unit is schema metadata.
+
+    Timestamps are timestamp[ns, tz=Asia/Dhaka], i.e. true UTC instants.
+    """
+    table = pa.table(
+        {
+            "timestamp": pa.array(
+                localized(forecast["timestamp"]),
+                type=pa.timestamp("ns", tz=FORECAST_TIMEZONE),
+            ),
+            "predicted_precipitation": pa.array(
+                forecast["predicted_precipitation"], type=pa.float64()
+            ),
+        }
+    ).replace_schema_metadata({"unit": unit})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_msgpack(forecast, unit="mm"):
+    """
+    Encode a columnar forecast as a MessagePack map of column arrays.
+
+    Timestamps are Unix epoch milliseconds (UTC); "timezone" names the zone
+    of the forecast's local hours.
+    """
+    epoch_ms = localized(forecast["timestamp"]).asi8 // 1_000_000
+    return msgpack.packb(
+        {
+            "timestamp": epoch_ms.tolist(),
+            "timezone": FORECAST_TIMEZONE,
+            "predicted_precipitation": np.asarray(
+                forecast["predicted_precipitation"], dtype=np.float64
+            ).tolist(),
+            "unit": unit,
+        }
+    )
+
+
+ENCODERS = {ARROW: encode_arrow, MSGPACK: encode_msgpack}
@@ -0,0 +1,435 @@
+import glob
+import os
+import re
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+PARTITION = re.compile(r"predictions-(\d{4})-(\d{2})\.sqlite3$")
+COLUMNS = ["target_hour", "model_version", "predicted_precipitation", "generated_at"]
+
+
+class PredictionHistory:
+    """
+    Append-only log of every served forecast, one SQLite file per target month.
+
+    Rows are (location, target_hour, model_version, predicted_precipitation,
+    generated_at), indexed on (location, target_hour, model_version), so a
+    range query only opens the months it covers and reads index ranges.
+    Target hours are the naive local times returned by /predict, stored as
+    epoch seconds.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, year, month):
+        return os.path.join(
+            self.directory, f"predictions-{year:04d}-{month:02d}.sqlite3"
+        )
+
+    def _connect(self, path):
+        db = sqlite3.connect(path, timeout=30)
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            "location TEXT, target_hour INTEGER, model_version TEXT, "
+            "predicted_precipitation REAL, generated_at REAL)"
+        )
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS by_hour ON predictions (location, target_hour, model_version)"
+        )
+        return db
+
+    def partitions(self):
+        """
+        Existing partitions as {(year, month): path}.
+        """
+        found = {}
+        for path in glob.glob(os.path.join(self.directory, "predictions-*.sqlite3")):
+            match = PARTITION.search(path)
+            if match:
+                found[int(match[1]), int(match[2])] = path
+        return found
+
+    def append(self, location, forecast, model_version, generated_at=None):
+        generated_at = time.time() if generated_at is None else generated_at
+        hours = pd.DatetimeIndex(forecast["timestamp"])
+        rows = pd.DataFrame(
+            {
+                "target_hour": hours.asi8 // 10**9,
+                "predicted_precipitation": np.asarray(
+                    forecast["predicted_precipitation"], dtype=float
+                ),
+                "year": hours.year,
+                "month": hours.month,
+            }
+        )
+        for (year, month), part in rows.groupby(["year", "month"]):
+            db = self._connect(self._path(year, month))
+            try:
+                with db:
+                    db.executemany(
+                        "INSERT INTO predictions VALUES (?, ?, ?, ?, ?)",
+                        [
+                            (
+                                location,
+                                int(hour),
+                                str(model_version),
+                                float(pred),
+                                generated_at,
+                            )
+                            for hour, pred in zip(
+                                part["target_hour"], part["predicted_precipitation"]
+                            )
+                        ],
+                    )
+            finally:
+                db.close()
+
+    def query(self, location, start, end, model_version=None, latest=False):
+        """
+        Predictions for target hours in [start, end], ordered by target hour.
+
+        With latest=True only the last prediction issued per target hour and
+        model version is returned.
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        months = pd.period_range(start.to_period("M"), end.to_period("M"), freq="M")
+        existing = self.partitions()
+
+        sql = (
+            "SELECT target_hour, model_version, predicted_precipitation, generated_at "
+            "FROM predictions WHERE location = ? AND target_hour BETWEEN ? AND ?"
+        )
+        params = [location, start.value // 10**9, end.value // 10**9]
+        if model_version is not None:
+            sql += " AND model_version = ?"
+            params.append(str(model_version))
+        if latest:
+            sql = (
+                "SELECT target_hour, model_version, predicted_precipitation, MAX(generated_at) "
+                f"FROM ({sql}) GROUP BY target_hour, model_version"
+            )
+
+        rows = []
+        for period in months:
+            path = existing.get((period.year, period.month))
+            if path is None:
+                continue
+            db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30)
+            try:
+                rows.extend(db.execute(sql, params).fetchall())
+            finally:
+                db.close()
+
+        df = pd.DataFrame(rows, columns=COLUMNS)
+        df["target_hour"] = pd.to_datetime(df["target_hour"], unit="s")
+        return df.sort_values(["target_hour", "generated_at"], ignore_index=True)
+
+    def maintain(self, retention_days, compact_after_days, now=None):
+        """
+        Drop partitions older than retention_days and compact older than compact_after_days.
+
+        Compaction keeps only the last prediction issued per (location,
+        target_hour, model_version) and vacuums the file; a compacted
+        partition is marked with user_version = 1 and skipped afterwards.
+        A partition is old once its whole month is past the cutoff.
+        Returns (dropped, compacted) partition counts.
+        """
+        now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+        drop_before = (now - pd.Timedelta(days=retention_days)).to_period("M")
+        compact_before = (now - pd.Timedelta(days=compact_after_days)).to_period("M")
+
+        dropped = compacted = 0
+        for (year, month), path in sorted(self.partitions().items()):
+            period = pd.Period(year=year, month=month, freq="M")
+            if retention_days > 0 and period < drop_before:
+                os.remove(path)
+                dropped += 1
+            elif compact_after_days > 0 and period < compact_before:
+                db = sqlite3.connect(path, timeout=30, isolation_level=None)
+                try:
+                    if db.execute("PRAGMA user_version").fetchone()[0] == 1:
+                        continue
+                    db.execute("BEGIN IMMEDIATE")
+                    db.execute(
+                        "DELETE FROM predictions WHERE rowid NOT IN ("
+                        "SELECT rowid FROM predictions p WHERE generated_at = ("
+                        "SELECT MAX(generated_at) FROM predictions q WHERE "
+                        "q.location = p.location AND q.target_hour = p.target_hour "
+                        "AND q.model_version = p.model_version))"
+                    )
+                    db.execute("PRAGMA user_version = 1")
+                    db.execute("COMMIT")
+                    db.execute("VACUUM")
+                    compacted += 1
+                finally:
+                    db.close()
+        return dropped, compacted
+
+
+class SqlPredictionHistory:
+    """
+    The same prediction history in a SQL database all replicas share.
+
+    Used when PREDICTION_HISTORY_URL is set (e.g. the Cloud SQL PostgreSQL
+    instance), so history survives restarts and every replica and the
+    precompute flow append to and query the same rows. On PostgreSQL the
+    prediction_history table is partitioned by month (PARTITION BY RANGE on
+    target_hour, partitions created on first append), so range queries
+    prune to the months they cover and retention drops whole partitions.
+    Other databases keep one table and delete rows instead. Compacted
+    months are recorded in prediction_history_compacted and skipped
+    afterwards.
+    """
+
+    def __init__(self, url):
+        import sqlalchemy as sa
+
+        self.sa = sa
+        self.engine = sa.create_engine(url, pool_pre_ping=True)
+        self.partitioned = self.engine.dialect.name == "postgresql"
+        self._known = set()
+        metadata = sa.MetaData()
+        self.table = sa.Table(
+            "prediction_history",
+            metadata,
+            sa.Column("location", sa.String(64), nullable=False),
+            sa.Column("target_hour", sa.BigInteger, nullable=False),
+            sa.Column("model_version", sa.String(64), nullable=False),
+            sa.Column("predicted_precipitation", sa.Float),
+            sa.Column("generated_at", sa.Float),
+            sa.Index(
+                "prediction_history_by_hour", "location", "target_hour", "model_version"
+            ),
+            **(
+                {"postgresql_partition_by": "RANGE (target_hour)"}
+                if self.partitioned
+                else {}
+            ),
+        )
+        self.compacted = sa.Table(
+            "prediction_history_compacted",
+            metadata,
+            sa.Column("month", sa.String(7), primary_key=True),
+        )
+        with self.engine.begin() as db:
+            self._lock(db)
+            metadata.create_all(db)
+
+    def _lock(self, db):
+        # Replicas starting or rolling over a month together would race on DDL
+        if self.partitioned:
+            db.execute(
+                self.sa.text(
+                    "SELECT pg_advisory_xact_lock(hashtext('prediction_history'))"
+                )
+            )
+
+    @staticmethod
+    def _bounds(period):
+        return (
+            period.start_time.value // 10**9,
+            (period + 1).start_time.value // 10**9,
+        )
+
+    def _create_partitions(self, db, periods):
+        missing = [p for p in periods if (p.year, p.month) not in self._known]
+        if not missing:
+            return
+        self._lock(db)
+        for period in missing:
+            low, high = self._bounds(period)
+            db.execute(
+                self.sa.text(
+                    f"CREATE TABLE IF NOT EXISTS prediction_history_{period.year:04d}_{period.month:02d} "
+                    f"PARTITION OF prediction_history FOR VALUES FROM ({low}) TO ({high})"
+                )
+            )
+        self._known.update((p.year, p.month) for p in missing)
+
+    def partitions(self, db=None):
+        """
+        Existing months as {(year, month): partition table}; None on unpartitioned databases.
+        """
+        if not self.partitioned:
+            return None
+        sql = self.sa.text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'prediction_history'"
+        )
+        if db is None:
+            with self.engine.connect() as db:
+                return self.partitions(db)
+        found = {}
+        for (name,) in db.execute(sql):
+            match = re.fullmatch(r"prediction_history_(\d{4})_(\d{2})", name)
+            if match:
+                found[int(match[1]), int(match[2])] = name
+        return found
+
+    def append(self, location, forecast, model_version, generated_at=None):
+        generated_at = time.time() if generated_at is None else generated_at
+        hours = pd.DatetimeIndex(forecast["timestamp"])
+        predictions = np.asarray(forecast["predicted_precipitation"], dtype=float)
+        with self.engine.begin() as db:
+            if self.partitioned:
+                self._create_partitions(db, hours.to_period("M").unique())
+            db.execute(
+                self.table.insert(),
+                [
+                    {
+                        "location": location,
+                        "target_hour": int(hour),
+                        "model_version": str(model_version),
+                        "predicted_precipitation": float(pred),
+                        "generated_at": generated_at,
+                    }
+                    for hour, pred in zip(hours.asi8 // 10**9, predictions)
+                ],
+            )
+
+    def query(self, location, start, end, model_version=None, latest=False):
+        """
+        Predictions for target hours in [start, end], ordered by target hour.
+
+        With latest=True only the last prediction issued per target hour and
+        model version is returned.
+        """
+        sa, t = self.sa, self.table
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        conditions = [
+            t.c.location == location,
+            t.c.target_hour.between(start.value // 10**9, end.value // 10**9),
+        ]
+        if model_version is not None:
+            conditions.append(t.c.model_version == str(model_version))
+        if latest:
+            newer = t.alias("newer")
+            conditions.append(
+                ~sa.exists().where(
+                    newer.c.location == t.c.location,
+                    newer.c.target_hour == t.c.target_hour,
+                    newer.c.model_version == t.c.model_version,
+                    newer.c.generated_at > t.c.generated_at,
+                )
+            )
+        sql = sa.select(*(t.c[name] for name in COLUMNS)).where(*conditions)
+        if latest:
+            sql = sql.distinct()
+        with self.engine.connect() as db:
+            rows = [tuple(row) for row in db.execute(sql)]
+
+        df = pd.DataFrame(rows, columns=COLUMNS)
+        df["target_hour"] = pd.to_datetime(df["target_hour"], unit="s")
+        return df.sort_values(["target_hour", "generated_at"], ignore_index=True)
+
+    def maintain(self, retention_days, compact_after_days, now=None):
+        """
+        Drop months older than retention_days and compact older than compact_after_days.
+
+        Same rules as PredictionHistory.maintain; returns (dropped, compacted)
+        month counts.
+        """
+        sa, t = self.sa, self.table
+        now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+        drop_before = (now - pd.Timedelta(days=retention_days)).to_period("M")
+        compact_before = (now - pd.Timedelta(days=compact_after_days)).to_period("M")
+
+        with self.engine.connect() as db:
+            done = set(db.execute(sa.select(self.compacted.c.month)).scalars())
+            partitions = self.partitions(db)
+            if partitions is None:
+                first, last = db.execute(
+                    sa.select(
+                        sa.func.min(t.c.target_hour), sa.func.max(t.c.target_hour)
+                    )
+                ).one()
+                months = (
+                    []
+                    if first is None
+                    else pd.period_range(
+                        pd.Timestamp(first, unit="s").to_period("M"),
+                        pd.Timestamp(last, unit="s").to_period("M"),
+                    )
+                )
+            else:
+                months = [
+                    pd.Period(year=y, month=m, freq="M") for y, m in sorted(partitions)
+                ]
+
+        dropped = compacted = 0
+        for period in months:
+            low, high = self._bounds(period)
+            in_month = t.c.target_hour >= low, t.c.target_hour < high
+            if retention_days > 0 and period < drop_before:
+                with self.engine.begin() as db:
+                    if partitions is None:
+                        if not db.execute(t.delete().where(*in_month)).rowcount:
+                            continue
+                    else:
+                        self._lock(db)
+                        db.execute(
+                            sa.text(
+                                f"DROP TABLE IF EXISTS {partitions[period.year, period.month]}"
+                            )
+                        )
+                        self._known.discard((period.year, period.month))
+                    db.execute(
+                        self.compacted.delete().where(
+                            self.compacted.c.month == str(period)
+                        )
+                    )
+                    dropped += 1
+            elif (
+                compact_after_days > 0
+                and period < compact_before
+                and str(period) not in done
+            ):
+                newer = t.alias("newer")
+                with self.engine.begin() as db:
+                    if not db.execute(
+                        sa.select(t.c.target_hour).where(*in_month).limit(1)
+                    ).first():
+                        continue
+                    db.execute(
+                        t.delete().where(
+                            *in_month,
+                            sa.exists().where(
+                                newer.c.location == t.c.location,
+                                newer.c.target_hour == t.c.target_hour,
+                                newer.c.model_version == t.c.model_version,
+                                newer.c.generated_at > t.c.generated_at,
+                            ),
+                        )
+                    )
+                    db.execute(self.compacted.insert(), {"month": str(period)})
+                    compacted += 1
+        return dropped, compacted
+
+
+def make_history(url, directory, shared_store=False):
+    """
+    History for PREDICTION_HISTORY_URL: unset means monthly SQLite files in
+    directory, otherwise an SQLAlchemy database URL shared by all replicas.
+
+    Refuses a directory under /tmp when forecasts are shared between replicas
+    (shared_store): each replica would keep its own partial history, lost on
+    every restart.
+    """
+    if url:
+        return SqlPredictionHistory(url)
+    if shared_store and os.path.abspath(directory).startswith(
+        (tempfile.gettempdir() + os.sep, "/tmp/")
+    ):
+        raise ValueError(
+            f"Prediction history in {directory} would not be shared between the "
+            "replicas of FORECAST_CACHE_URL: set PREDICTION_HISTORY_URL to a shared "
+            "database (or PREDICTION_HISTORY_DIR to a persistent shared volume)"
+        )
+    return PredictionHistory(directory)
@@ -1,11 +1,48 @@
-# app/main.py
+import math
 import os
+import secrets
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from prometheus_client import make_asgi_app
 
-from app.predict import forecast_next_24_hours
+from app.admission import AdmissionController, Coalescer, Overloaded
+from app.encoding import ENCODERS, SUPPORTED, negotiate, to_records
+from app.precompute import get_forecast, history, start_scheduler
+from utils import profiling
+from utils.config import (
+    get_admin_token,
+    get_precompute_interval,
+    get_predict_max_concurrency,
+    get_predict_max_queue,
+    get_predict_max_queue_wait,
+    get_predict_retry_after,
+)
+from utils.ratelimit import RateLimitTimeout
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app):
+    interval = get_precompute_interval()
+    stop = start_scheduler(interval) if interval > 0 else None
+    yield
+    if stop is not None:
+        stop.set()
+
+
+app = FastAPI(lifespan=lifespan)
+app.mount("/metrics", make_asgi_app())
+
+admission = AdmissionController(
+    get_predict_max_concurrency(),
+    get_predict_max_queue(),
+    get_predict_max_queue_wait(),
+    retry_after=get_predict_retry_after(),
+)
+coalescer = Coalescer()
 
 
 @app.get("/")
@@ -13,9 +50,152 @@ def root():
     return {"message": "🌦️ Welcome to the Dhaka City Precipitation Forecast API!"}
 
 
+def freshness_headers(source, generated_at):
+    return {
+        "X-Forecast-Source": source,
+        "X-Forecast-Generated-At": datetime.fromtimestamp(
+            generated_at, tz=timezone.utc
+        ).isoformat(),
+        "X-Forecast-Age-Seconds": str(
+            int(datetime.now(timezone.utc).timestamp() - generated_at)
+        ),
+        "Vary": "Accept",
+    }
+
+
+@profiling.sampled_profile("predict")
+def build_forecast_response(location, media_type):
+    """
+    Get the forecast and encode it: the body (records for JSON) and headers.
+    """
+    forecast, generated_at, source = get_forecast(location)
+    headers = freshness_headers(source, generated_at)
+    if media_type in ENCODERS:
+        return ENCODERS[media_type](forecast), headers
+    return to_records(forecast), headers
+
+
+async def admitted_forecast_response(location, media_type):
+    async with admission.admit():
+        return await run_in_threadpool(build_forecast_response, location, media_type)
+
+
 @app.get("/predict")
-def predict():
-    return forecast_next_24_hours()
+async def predict(request: Request, response: Response, location: str = "dhaka"):
+    """
+    Identical concurrent requests share one computation; distinct ones are
+    admitted up to PREDICT_MAX_CONCURRENCY at a time, with a bounded wait
+    queue, and shed with 503 + Retry-After beyond it.
+    """
+    media_type = negotiate(request.headers.get("accept"))
+    if media_type is None:
+        raise HTTPException(
+            status_code=406, detail=f"Supported media types: {', '.join(SUPPORTED)}"
+        )
+
+    try:
+        content, headers = await coalescer.run(
+            (location, media_type), admitted_forecast_response, location, media_type
+        )
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown location '{location}'")
+    except RateLimitTimeout as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+
+    if media_type in ENCODERS:
+        return Response(content, media_type=media_type, headers=headers)
+
+    response.headers.update(headers)
+    return content
+
+
+def forecast_local_time(value):
+    """
+    Convert an aware datetime to the naive Asia/Dhaka time forecasts are keyed by.
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(ZoneInfo("Asia/Dhaka")).replace(tzinfo=None)
+
+
+@app.get("/predictions")
+def predictions(
+    start: datetime,
+    end: datetime,
+    location: str = "dhaka",
+    model_version: str | None = None,
+    latest: bool = False,
+):
+    """
+    Predictions served for target hours in [start, end].
+
+    Naive times are Asia/Dhaka local time, like the /predict timestamps. Every
+    issued prediction is returned unless latest=true, which keeps the last one
+    per target hour and model version.
+    """
+    start, end = forecast_local_time(start), forecast_local_time(end)
+    if start > end:
+        raise HTTPException(status_code=422, detail="start must not be after end")
+
+    df = history.query(location, start, end, model_version=model_version, latest=latest)
+    return {
+        "location": location,
+        "unit": "mm",
+        "predictions": [
+            {
+                "target_hour": row.target_hour.isoformat(),
+                "model_version": row.model_version,
+                "predicted_precipitation": row.predicted_precipitation,
+                "generated_at": datetime.fromtimestamp(
+                    row.generated_at, tz=timezone.utc
+                ).isoformat(),
+            }
+            for row in df.itertuples(index=False)
+        ],
+    }
+
+
+def check_admin(token):
+    expected = get_admin_token()
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not token or not secrets.compare_digest(token, expected):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.get("/admin/profiling")
+def get_profiling(x_admin_token: str | None = Header(default=None)):
+    check_admin(x_admin_token)
+    return profiling.settings
+
+
+@app.post("/admin/profiling")
+def set_profiling(
+    sample_rate: float | None = None,
+    tracemalloc: bool | None = None,
+    x_admin_token: str | None = Header(default=None),
+):
+    """
+    Switch per-request profiling (0-1 fraction of requests) and tracemalloc.
+    """
+    check_admin(x_admin_token)
+    if sample_rate is not None:
+        if not 0 <= sample_rate <= 1:
+            raise HTTPException(status_code=422, detail="sample_rate must be in [0, 1]")
+        profiling.settings["sample_rate"] = sample_rate
+    if tracemalloc is not None:
+        profiling.settings["tracemalloc"] = tracemalloc
+    return profiling.settings
 
 
 # 👇 Add this only if you're running this file directly
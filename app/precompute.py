@@ -0,0 +1,162 @@
+import logging
+import threading
+import time
+
+from app.history import make_history
+from app.predict import compute_forecast, model_version
+from app.store import RedisForecastStore, make_store
+from utils.config import (
+    get_forecast_cache_ttl,
+    get_forecast_cache_url,
+    get_forecast_locations,
+    get_forecast_lock_ttl,
+    get_forecast_max_age,
+    get_forecast_store_dir,
+    get_history_compact_after_days,
+    get_history_retention_days,
+    get_prediction_history_dir,
+    get_prediction_history_url,
+)
+from utils.ratelimit import RateLimitTimeout
+
+logger = logging.getLogger(__name__)
+
+store = make_store(
+    get_forecast_cache_url(), get_forecast_store_dir(), get_forecast_cache_ttl()
+)
+history = make_history(
+    get_prediction_history_url(),
+    get_prediction_history_dir(),
+    shared_store=isinstance(store, RedisForecastStore),
+)
+
+
+def save_forecast(location, forecast):
+    """
+    Store the forecast for serving and append it to the prediction history.
+    """
+    generated_at = store.put(location, forecast)
+    try:
+        history.append(location, forecast, model_version, generated_at)
+    except Exception as e:
+        logger.error(f"Appending {location} to the prediction history failed: {e}")
+    return generated_at
+
+
+def maintain_history():
+    try:
+        dropped, compacted = history.maintain(
+            get_history_retention_days(), get_history_compact_after_days()
+        )
+    except Exception as e:
+        logger.error(f"Prediction history maintenance failed: {e}")
+        return
+    if dropped or compacted:
+        logger.info(
+            f"Prediction history: dropped {dropped}, compacted {compacted} months"
+        )
+
+
+def refresh(location, latitude, longitude, max_age):
+    """
+    Recompute a location's forecast under the store lock unless a fresh one exists.
+
+    Returns (forecast, generated_at, source), or None when another worker or
+    replica holds the lock and is refreshing it.
+    """
+    with store.lock(location, ttl=get_forecast_lock_ttl()) as acquired:
+        if not acquired:
+            return None
+        # Another replica may have refreshed it since we last looked
+        stored = store.get(location)
+        if stored is not None and time.time() - stored[1] <= max_age:
+            return stored[0], stored[1], "store"
+        forecast = compute_forecast(latitude, longitude)
+        return forecast, save_forecast(location, forecast), "on-demand"
+
+
+def precompute_all(locations=None, min_age=0):
+    """
+    Compute and store the forecast of every configured location.
+
+    Locations whose stored forecast is younger than min_age seconds, or that
+    another replica is refreshing, are skipped. Returns {name: outcome}, with
+    outcome "computed", "skipped" or "failed".
+    """
+    locations = locations or get_forecast_locations()
+    outcomes = {}
+    for name, (latitude, longitude) in locations.items():
+        try:
+            result = refresh(name, latitude, longitude, max_age=min_age)
+        except Exception as e:
+            logger.error(f"Precomputing forecast for {name} failed: {e}")
+            outcomes[name] = "failed"
+            continue
+        if result is None or result[2] == "store":
+            logger.info(f"Forecast for {name} is fresh or being refreshed elsewhere")
+            outcomes[name] = "skipped"
+        else:
+            logger.info(f"Precomputed forecast for {name}")
+            outcomes[name] = "computed"
+    return outcomes
+
+
+def start_scheduler(interval):
+    """
+    Run precompute_all (and history retention/compaction) now and then every
+    `interval` seconds in a daemon thread.
+
+    Returns an Event that stops the scheduler when set.
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.is_set():
+            started = time.monotonic()
+            precompute_all(min_age=interval / 2)
+            maintain_history()
+            stop.wait(max(interval - (time.monotonic() - started), 0))
+
+    threading.Thread(target=run, name="forecast-precompute", daemon=True).start()
+    return stop
+
+
+def get_forecast(location):
+    """
+    Return (forecast, generated_at, source) for a configured location.
+
+    Serves the stored forecast while it is younger than FORECAST_MAX_AGE_SECONDS,
+    otherwise computes it on demand and refreshes the store; only the worker
+    holding the store lock computes, the others serve the older forecast or
+    wait for the new one. When the Open-Meteo serving budget is exhausted an
+    older stored forecast is served ("store-stale"). Raises KeyError for
+    unknown locations.
+    """
+    latitude, longitude = get_forecast_locations()[location]
+
+    stored = store.get(location)
+    if stored is not None and time.time() - stored[1] <= get_forecast_max_age():
+        return stored[0], stored[1], "store"
+
+    try:
+        result = refresh(location, latitude, longitude, get_forecast_max_age())
+    except RateLimitTimeout as e:
+        if stored is None:
+            raise
+        logger.warning(f"Serving stale forecast for {location}: {e}")
+        return stored[0], stored[1], "store-stale"
+    if result is not None:
+        return result
+
+    # Another worker or replica is refreshing it: serve what is stored, or
+    # wait for its result rather than calling Open-Meteo as well.
+    if stored is not None:
+        return stored[0], stored[1], "store-stale"
+    deadline = time.monotonic() + get_forecast_lock_ttl()
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        stored = store.get(location)
+        if stored is not None:
+            return stored[0], stored[1], "store"
+    forecast = compute_forecast(latitude, longitude)
+    return forecast, save_forecast(location, forecast), "on-demand"
@@ -1,41 +1,85 @@
-# app/predict.py
+import logging
+
+import numpy as np
 import pandas as pd
 
-from app.model import load_model
+from app.encoding import to_records
+from app.model import load_model, model_registry
+from app.shadow import ShadowRunner
 from app.utils import engineer_features, fetch_weather
+from utils.config import (
+    get_challenger_alias,
+    get_shadow_log_path,
+    get_shadow_queue_size,
+)
+from utils.profiling import trace_memory
+
+logger = logging.getLogger(__name__)
 
 model = load_model()
+model_version = model_registry.resolve("champion")["version"]
+
+
+def load_shadow():
+    """
+    Start shadow inference for the challenger alias, if one is configured.
+    """
+    alias = get_challenger_alias()
+    if not alias:
+        return None
+    try:
+        challenger = load_model(alias=alias)
+    except Exception as e:
+        logger.warning(f"Shadow inference disabled, cannot load '{alias}': {e}")
+        return None
+    return ShadowRunner(
+        challenger,
+        get_shadow_log_path(),
+        max_queue=get_shadow_queue_size(),
+        versions={
+            "champion": model_version,
+            "challenger": model_registry.resolve(alias)["version"],
+        },
+    )
 
 
-def forecast_next_24_hours():
-    df = fetch_weather()
-    X = engineer_features(df)
+shadow = load_shadow()
 
-    # Make predictions
-    preds = model.predict(X)
 
-    # Clip negative predictions and round
-    preds = [max(0, round(p, 2)) for p in preds]
+def compute_forecast(latitude=23.8103, longitude=90.4125):
+    """
+    Fetch, featurize and predict; returns the forecast as columnar arrays.
+    """
+    df = fetch_weather(latitude, longitude)
+    with trace_memory("engineer_features"):
+        X = engineer_features(df)
 
-    # Add predictions to dataframe
-    df["predicted_precipitation"] = preds
+    # Make predictions, clip negative predictions and round
+    with trace_memory("model_predict"):
+        preds = np.maximum(np.round(np.asarray(model.predict(X)), 2), 0)
 
     # Add timestamp column
     if "time" in df.columns:
-        df["hour"] = pd.to_datetime(df["time"])
+        hours = pd.to_datetime(df["time"])
     else:
-        df["hour"] = pd.date_range(
-            start=pd.Timestamp.now(), periods=len(preds), freq="H"
+        hours = pd.date_range(start=pd.Timestamp.now(), periods=len(preds), freq="H")
+
+    forecast = {
+        "timestamp": np.asarray(hours, dtype="datetime64[ns]"),
+        "predicted_precipitation": preds.astype("float64"),
+    }
+
+    if shadow is not None:
+        shadow.submit(
+            X,
+            forecast["predicted_precipitation"],
+            forecast["timestamp"],
+            latitude=latitude,
+            longitude=longitude,
         )
 
-    # Add unit
-    df["unit"] = "mm"
+    return forecast
 
-    # Format result
-    result = (
-        df[["hour", "predicted_precipitation", "unit"]]
-        .rename(columns={"hour": "timestamp"})
-        .to_dict(orient="records")
-    )
 
-    return result
+def forecast_next_24_hours(latitude=23.8103, longitude=90.4125):
+    return to_records(compute_forecast(latitude, longitude))
@@ -0,0 +1,149 @@
+import json
+import logging
+import queue
+import threading
+import time
+
+import numpy as np
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+SHADOW_PREDICTIONS = Counter(
+    "shadow_predictions_total", "Challenger predictions completed"
+)
+SHADOW_DROPPED = Counter(
+    "shadow_dropped_total", "Shadow jobs dropped because the queue was full"
+)
+SHADOW_FAILURES = Counter("shadow_failures_total", "Shadow jobs that raised")
+SHADOW_CPU = Counter(
+    "shadow_cpu_seconds_total", "CPU time of the challenger predictions"
+)
+SHADOW_LATENCY = Histogram(
+    "shadow_predict_seconds", "Wall time of one challenger predict"
+)
+SHADOW_QUEUE_DEPTH = Gauge("shadow_queue_depth", "Shadow jobs waiting")
+
+
+def pin_single_thread(model):
+    """
+    Make an XGBoost model, bare or inside an MLflow pyfunc, predict on the
+    calling thread only. Returns False when the model has no thread setting.
+    """
+    raw = model.get_raw_model() if hasattr(model, "get_raw_model") else model
+    if hasattr(raw, "get_params") and "n_jobs" in raw.get_params():
+        raw.set_params(n_jobs=1)
+        return True
+    if hasattr(raw, "set_param"):
+        raw.set_param({"nthread": 1})
+        return True
+    return False
+
+
+class ShadowRunner:
+    """
+    Run a challenger model on the champion's feature matrix off the request path.
+
+    submit() never blocks: when the bounded queue is full the job is dropped
+    and counted. A single daemon worker predicts and appends both predictions
+    to a JSON-lines log for offline comparison.
+
+    The challenger is pinned to one thread so that all of its work, native
+    code included, runs on the worker and thread_time() is its full CPU
+    cost. A model that cannot be pinned is measured with process_time(),
+    which also counts whatever else the process runs meanwhile.
+    """
+
+    def __init__(self, model, log_path, max_queue=8, versions=None):
+        self.model = model
+        self.log_path = log_path
+        self.versions = versions or {}
+        self.single_threaded = pin_single_thread(model)
+        if not self.single_threaded:
+            logger.warning(
+                "Challenger cannot be pinned to one thread; "
+                "shadow CPU time is measured process-wide"
+            )
+        self._cpu_time = time.thread_time if self.single_threaded else time.process_time
+        self.queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(
+            target=self._run, name="shadow-inference", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, X, champion_preds, timestamps=None, **context):
+        try:
+            self.queue.put_nowait((X, champion_preds, timestamps, context))
+        except queue.Full:
+            SHADOW_DROPPED.inc()
+            return False
+        SHADOW_QUEUE_DEPTH.set(self.queue.qsize())
+        return True
+
+    def drain(self, timeout):
+        """
+        Wait up to timeout seconds for the queued jobs; returns True once none are left.
+        """
+        deadline = time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            SHADOW_QUEUE_DEPTH.set(self.queue.qsize())
+            cpu_start = self._cpu_time()
+            try:
+                self._shadow(*job)
+            except Exception as e:
+                SHADOW_FAILURES.inc()
+                logger.error(f"Shadow prediction failed: {e}")
+            finally:
+                SHADOW_CPU.inc(self._cpu_time() - cpu_start)
+                self.queue.task_done()
+
+    def _shadow(self, X, champion_preds, timestamps, context):
+        with SHADOW_LATENCY.time():
+            challenger_preds = np.maximum(
+                np.round(np.asarray(self.model.predict(X)), 2), 0
+            )
+        SHADOW_PREDICTIONS.inc()
+
+        record = {
+            "logged_at": time.time(),
+            **context,
+            **{f"{role}_version": v for role, v in self.versions.items()},
+            "timestamp": (
+                None
+                if timestamps is None
+                else np.datetime_as_string(timestamps).tolist()
+            ),
+            "champion": np.asarray(champion_preds, dtype=float).tolist(),
+            "challenger": challenger_preds.astype(float).tolist(),
+        }
+        with open(self.log_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def shadow_registry():
+    """
+    Registry of the shadow metrics alone, for pushing from a process without /metrics.
+    """
+    from prometheus_client import CollectorRegistry
+
+    registry = CollectorRegistry()
+    for metric in (
+        SHADOW_PREDICTIONS,
+        SHADOW_DROPPED,
+        SHADOW_FAILURES,
+        SHADOW_CPU,
+        SHADOW_LATENCY,
+        SHADOW_QUEUE_DEPTH,
+    ):
+        registry.register(metric)
+    return registry
@@ -0,0 +1,223 @@
+import fcntl
+import os
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+# magic, flags, generated_at, n, first timestamp (s), step (s)
+HEADER = struct.Struct("<4sBdIqq")
+MAGIC = b"FCST"
+REGULAR = 1
+
+
+class ForecastStore:
+    """
+    Keyed local store of precomputed forecasts, one .npz file per key.
+
+    Writes go to a temporary file that is renamed into place, so readers in
+    other threads or worker processes never see a partial forecast.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def put(self, key, forecast, generated_at=None):
+        generated_at = time.time() if generated_at is None else generated_at
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, generated_at=np.float64(generated_at), **forecast)
+        os.replace(tmp_path, self._path(key))
+        return generated_at
+
+    def get(self, key):
+        """
+        Return (forecast, generated_at) for key, or None if nothing is stored.
+        """
+        try:
+            with np.load(self._path(key)) as data:
+                forecast = {k: data[k] for k in data.files if k != "generated_at"}
+                return forecast, float(data["generated_at"])
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def lock(self, key, ttl=None):
+        """
+        Non-blocking exclusive lock on key across processes on this host.
+
+        Yields True when acquired. The flock is released with the file, so a
+        crashed worker cannot keep it; ttl is unused.
+        """
+        with open(os.path.join(self.directory, f"{key}.lock"), "w") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def encode_forecast(forecast, generated_at):
+    """
+    Pack a forecast into a compact binary record.
+
+    Hourly timestamps are stored as (first, step) and predictions as float32
+    (they carry 0.01 mm precision, which compute_forecast rounds to), so a
+    24-hour forecast takes 129 bytes.
+    """
+    seconds = np.asarray(forecast["timestamp"], dtype="datetime64[s]").astype(np.int64)
+    steps = np.diff(seconds)
+    regular = len(seconds) > 1 and (steps == steps[0]).all()
+    header = HEADER.pack(
+        MAGIC,
+        REGULAR if regular else 0,
+        generated_at,
+        len(seconds),
+        int(seconds[0]) if len(seconds) else 0,
+        int(steps[0]) if regular else 0,
+    )
+    predictions = np.asarray(forecast["predicted_precipitation"], dtype="<f4")
+    body = b"" if regular else seconds.astype("<i8").tobytes()
+    return header + body + predictions.tobytes()
+
+
+def decode_forecast(data):
+    """
+    Unpack encode_forecast output into (forecast, generated_at).
+    """
+    magic, flags, generated_at, n, first, step = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not an encoded forecast")
+    offset = HEADER.size
+    if flags & REGULAR:
+        seconds = first + step * np.arange(n, dtype=np.int64)
+    else:
+        seconds = np.frombuffer(data, dtype="<i8", count=n, offset=offset)
+        offset += 8 * n
+    predictions = np.frombuffer(data, dtype="<f4", count=n, offset=offset)
+    forecast = {
+        "timestamp": seconds.astype("datetime64[s]").astype("datetime64[ns]"),
+        "predicted_precipitation": np.round(predictions.astype(np.float64), 2),
+    }
+    return forecast, generated_at
+
+
+class MemoryForecastStore:
+    """
+    In-process store with the ForecastStore interface, holding encoded forecasts.
+
+    Entries are copies, so callers cannot mutate what other requests get.
+    Only useful for a single worker process (and tests).
+    """
+
+    def __init__(self, ttl_seconds=None):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def put(self, key, forecast, generated_at=None):
+        generated_at = time.time() if generated_at is None else generated_at
+        expires = None if not self.ttl_seconds else time.monotonic() + self.ttl_seconds
+        self._entries[key] = (encode_forecast(forecast, generated_at), expires)
+        return generated_at
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or (entry[1] is not None and time.monotonic() > entry[1]):
+            return None
+        return decode_forecast(entry[0])
+
+    @contextmanager
+    def lock(self, key, ttl=None):
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        acquired = lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+
+
+# Delete the lock only if it still holds our token (it may have expired and
+# been taken by another replica meanwhile).
+RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class RedisForecastStore:
+    """
+    Forecast store shared by all replicas through a Redis-protocol server.
+
+    Values are encode_forecast records that expire after ttl_seconds. lock()
+    is a SET NX PX lease released by a compare-and-delete script, so only one
+    replica refreshes a key at a time and a crashed holder's lease runs out.
+    """
+
+    def __init__(self, url, ttl_seconds=None, prefix="forecast:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError(
+                "A redis:// forecast cache requires redis-py: pip install redis"
+            ) from e
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self._release = self.client.register_script(RELEASE_LOCK)
+
+    def put(self, key, forecast, generated_at=None):
+        generated_at = time.time() if generated_at is None else generated_at
+        self.client.set(
+            self.prefix + key,
+            encode_forecast(forecast, generated_at),
+            px=int(self.ttl_seconds * 1000) if self.ttl_seconds else None,
+        )
+        return generated_at
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        return None if data is None else decode_forecast(data)
+
+    @contextmanager
+    def lock(self, key, ttl=30):
+        name = f"{self.prefix}lock:{key}"
+        token = uuid.uuid4().hex
+        acquired = bool(self.client.set(name, token, nx=True, px=int(ttl * 1000)))
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self._release(keys=[name], args=[token])
+
+
+def make_store(url, directory, ttl_seconds=None):
+    """
+    Store for FORECAST_CACHE_URL: unset means local files in directory,
+    "memory://" an in-process store and "redis://..." a shared Redis store.
+    """
+    if not url:
+        return ForecastStore(directory)
+    if url.startswith("memory://"):
+        return MemoryForecastStore(ttl_seconds)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisForecastStore(url, ttl_seconds)
+    raise ValueError(f"Unsupported FORECAST_CACHE_URL '{url}'")
@@ -3,11 +3,13 @@ import numpy as np
 import pandas as pd
 import requests
 
+from utils.ratelimit import get_open_meteo
 
-def fetch_weather():
+
+def fetch_weather(latitude=23.8103, longitude=90.4125):
     params = {
-        "latitude": 23.8103,
-        "longitude": 90.4125,
+        "latitude": latitude,
+        "longitude": longitude,
         "hourly": ",".join(
             [
                 "temperature_2m",
@@ -29,6 +31,7 @@ def fetch_weather():
         "timezone": "Asia/Dhaka",
     }
 
+    get_open_meteo().acquire("serving")
     response = requests.get("https://api.open-meteo.com/v1/forecast", params=params)
     response.raise_for_status()
     return pd.DataFrame(response.json()["hourly"])
@@ -0,0 +1,53 @@
+# benchmarks/bench_encoding.py
+# Compare encoding time and payload size of the /predict response formats.
+# Run from the repo root:
+#   python benchmarks/bench_encoding.py
+
+import json
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+
+from app.encoding import encode_arrow, encode_msgpack, to_records
+
+
+def make_forecast(hours):
+    start = np.datetime64("2025-06-01T00", "h")
+    return {
+        "timestamp": (start + np.arange(hours)).astype("datetime64[ns]"),
+        "predicted_precipitation": np.round(np.random.rand(hours) * 5, 2),
+    }
+
+
+def encode_json(forecast):
+    # What FastAPI does for the default response: records -> jsonable_encoder -> JSON
+    return json.dumps(jsonable_encoder(to_records(forecast))).encode()
+
+
+FORMATS = {
+    "application/json": encode_json,
+    "application/vnd.apache.arrow.stream": encode_arrow,
+    "application/msgpack": encode_msgpack,
+}
+
+
+def bench(hours, repeat=5):
+    forecast = make_forecast(hours)
+    for name, encode in FORMATS.items():
+        number = max(1, 2000 // hours)
+        seconds = min(
+            timeit.repeat(lambda: encode(forecast), number=number, repeat=repeat)
+        )
+        size = len(encode(forecast))
+        print(f"{hours:>7} {name:<38} {seconds / number * 1e3:>10.3f} {size:>12}")
+
+
+if __name__ == "__main__":
+    print(f"{'hours':>7} {'format':<38} {'encode ms':>10} {'bytes':>12}")
+    for hours in [24, 24 * 16, 24 * 365]:
+        bench(hours)
@@ -0,0 +1,96 @@
+# benchmarks/load_predict.py
+# Open-loop load test of /predict: requests are sent at a fixed rate whether or
+# not earlier ones have finished, so overload shows up as queueing/shedding
+# rather than as a slower client. Reports status counts and latency percentiles.
+# Requires httpx (pip install httpx). Run from the repo root:
+#   python benchmarks/load_predict.py --url http://localhost:8080 --rate 200 --duration 20
+#   python benchmarks/load_predict.py --locations dhaka,sylhet,khulna --accept application/msgpack
+# benchmarks/simulated_server.py serves the app over a slow simulated backend
+# for reproducible overload runs (--distinct spreads requests over many
+# locations so coalescing does not absorb the load).
+
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+
+import httpx
+import numpy as np
+
+
+async def send(client, url, params, headers, results):
+    start = time.perf_counter()
+    try:
+        response = await client.get(url, params=params, headers=headers)
+        status = response.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    results.append((status, time.perf_counter() - start))
+
+
+async def run(url, rate, duration, locations, accept, timeout):
+    results = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        tasks = []
+        start = time.perf_counter()
+        for i in range(int(rate * duration)):
+            # Sleep until this request's scheduled send time
+            await asyncio.sleep(max(start + i / rate - time.perf_counter(), 0))
+            params = {"location": random.choice(locations)}
+            tasks.append(
+                asyncio.ensure_future(
+                    send(client, f"{url}/predict", params, {"Accept": accept}, results)
+                )
+            )
+        await asyncio.gather(*tasks)
+    return results, time.perf_counter() - start
+
+
+def report(results, elapsed):
+    print(
+        f"{'status':>8} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    )
+    by_status = Counter(status for status, _ in results)
+    for status, count in sorted(by_status.items(), key=lambda item: str(item[0])):
+        latencies = np.array([s for st, s in results if st == status]) * 1e3
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(
+            f"{status:>8} {count:>7} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f} {latencies.max():>9.1f}"
+        )
+    print(f"Goodput: {by_status.get(200, 0) / elapsed:.1f} req/s over {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--rate", type=float, default=100, help="Requests per second")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds")
+    parser.add_argument(
+        "--locations", default="dhaka", help="Comma-separated, picked at random"
+    )
+    parser.add_argument(
+        "--distinct",
+        type=int,
+        help="Use locations loc0..locN-1 instead (for simulated_server.py)",
+    )
+    parser.add_argument("--accept", default="application/json")
+    parser.add_argument("--timeout", type=float, default=60, help="Client timeout (s)")
+    args = parser.parse_args()
+
+    results, elapsed = asyncio.run(
+        run(
+            args.url.rstrip("/"),
+            args.rate,
+            args.duration,
+            (
+                [f"loc{i}" for i in range(args.distinct)]
+                if args.distinct
+                else args.locations.split(",")
+            ),
+            args.accept,
+            args.timeout,
+        )
+    )
+    report(results, elapsed)
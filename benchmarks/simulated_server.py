@@ -0,0 +1,75 @@
+# benchmarks/simulated_server.py
+# Serve the real /predict stack (admission control, coalescing, encoding) over
+# a simulated backend, so load_predict.py can show queueing and shedding
+# without MLflow or Open-Meteo. The model is replaced by zeros and every
+# forecast blocks for --simulate-ms, with at most --capacity at once (a
+# saturated upstream: capacity / simulate-ms requests per second).
+# Admission settings come from the usual env vars. Run from the repo root:
+#   PREDICT_MAX_CONCURRENCY=4 python benchmarks/simulated_server.py --port 8105 &
+#   python benchmarks/load_predict.py --url http://127.0.0.1:8105 --rate 30 --duration 20 --distinct 2000
+# With admission effectively off:
+#   PREDICT_MAX_CONCURRENCY=100000 PREDICT_MAX_QUEUE=100000 PREDICT_MAX_QUEUE_WAIT_SECONDS=1000 \
+#     python benchmarks/simulated_server.py --port 8106 &
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+class ZeroModel:
+    def predict(self, X):
+        return np.zeros(len(X))
+
+
+def simulated_app(simulate_ms, capacity):
+    os.environ["FORECAST_PRECOMPUTE_INTERVAL_SECONDS"] = "0"
+
+    # Stub the registry before app.predict loads the champion at import
+    import app.model
+
+    app.model.load_model = lambda *args, **kwargs: ZeroModel()
+    app.model.model_registry.resolve = lambda *args, **kwargs: {"version": "0"}
+
+    import app.main
+
+    slots = threading.Semaphore(capacity)
+    hours = np.arange("2025-06-01T00", "2025-06-02T00", dtype="datetime64[h]")
+
+    def get_forecast(location):
+        with slots:
+            time.sleep(simulate_ms / 1000)
+        forecast = {
+            "timestamp": hours.astype("datetime64[ns]"),
+            "predicted_precipitation": np.zeros(len(hours)),
+        }
+        return forecast, time.time(), "on-demand"
+
+    app.main.get_forecast = get_forecast
+    return app.main.app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--simulate-ms", type=float, default=500, help="Blocking time per forecast"
+    )
+    parser.add_argument(
+        "--capacity", type=int, default=4, help="Forecasts computed at once"
+    )
+    args = parser.parse_args()
+
+    uvicorn.run(
+        simulated_app(args.simulate_ms, args.capacity),
+        host="127.0.0.1",
+        port=args.port,
+        log_level="warning",
+    )
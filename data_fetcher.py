@@ -4,6 +4,9 @@ from datetime import datetime, timedelta, timezone
 import pandas as pd
 import requests
 
+from utils.instrumentation import record_bytes
+from utils.ratelimit import get_open_meteo
+
 
 def get_dynamic_date_range(days_back=7300, buffer_days=2):
     today = datetime.now(timezone.utc).date()
@@ -38,8 +41,10 @@ def fetch_weather_data(
         f"Fetching weather data from {start_date} to {end_date} for lat: {latitude}, lon: {longitude}"
     )
 
+    get_open_meteo().acquire("batch")
     response = requests.get(base_url, params=params)
     response.raise_for_status()
+    record_bytes(len(response.content))
 
     data = response.json()
     df = pd.DataFrame(data["hourly"])
@@ -7,26 +7,38 @@ from prefect.blocks.notifications import SendgridEmail
 
 from data_fetcher import fetch_weather_data, get_dynamic_date_range
 from utils.config import get_bucket_name, get_sendgrid_block
+from utils.instrumentation import instrumented, pipeline_metrics_hook, record_bytes
+from utils.profiling import add_profile_argument, enable_task_profiling
 
 
 @task
+@instrumented
+def fetch_data(latitude, longitude, hourly_vars, start_date, end_date):
+    return fetch_weather_data(latitude, longitude, hourly_vars, start_date, end_date)
+
+
+@task
+@instrumented
 def save_to_local(df, file_path):
     os.makedirs(os.path.dirname(file_path), exist_ok=True)
     df.to_csv(file_path, index=False)
+    record_bytes(os.path.getsize(file_path))
     return file_path
 
 
 @task
+@instrumented
 def upload_to_gcs(file_path, destination_blob_name, bucket_name):
     logger = get_run_logger()
     storage_client = storage.Client()
     bucket = storage_client.bucket(bucket_name)
     blob = bucket.blob(destination_blob_name)
     blob.upload_from_filename(file_path)
+    record_bytes(os.path.getsize(file_path))
     logger.info(f"Uploaded {file_path} to gs://{bucket_name}/{destination_blob_name}")
 
 
-@flow
+@flow(on_completion=[pipeline_metrics_hook], on_failure=[pipeline_metrics_hook])
 def fetch_and_upload_flow():
     logger = get_run_logger()
     flow_start_time = datetime.now()
@@ -56,7 +68,7 @@ def fetch_and_upload_flow():
     start_date, end_date = get_dynamic_date_range(days_back=7300, buffer_days=2)
 
     # Fetch data
-    df = fetch_weather_data(23.8041, 90.4152, hourly_vars, start_date, end_date)
+    df = fetch_data(23.8041, 90.4152, hourly_vars, start_date, end_date)
 
     # Local save
     local_file = f"../data/raw_dhaka_weather_{start_date}_to_{end_date}.csv"
@@ -93,4 +105,12 @@ def fetch_and_upload_flow():
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fetch and upload training data.")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    if args.profile:
+        enable_task_profiling(args.profile)
     fetch_and_upload_flow()
@@ -6,55 +6,81 @@ import mlflow
 import numpy as np
 import pandas as pd
 import requests
-from mlflow.tracking import MlflowClient
-from prefect import flow, get_run_logger, task
+from prefect import flow, get_run_logger, task, unmapped
 from prefect.blocks.notifications import SendgridEmail
-from prometheus_client import CollectorRegistry, Gauge, push_to_gateway
+from prometheus_client import CollectorRegistry, Gauge
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
 from utils.config import get_sendgrid_block
+from utils.instrumentation import (
+    instrumented,
+    pipeline_metrics_hook,
+    push_with_retry,
+    record_bytes,
+)
+from utils.profiling import add_profile_argument, enable_task_profiling
+from utils.ratelimit import get_open_meteo
+from utils.registry import ModelRegistry
 
 # === Setup ===
 mlflow.set_tracking_uri("http://127.0.0.1:5000")
-client = MlflowClient()
-
-
-# === Tasks ===
-@task
-def fetch_weather_3_days_ago():
-    logger = get_run_logger()
-    target_date = (datetime.now(timezone.utc) - timedelta(days=3)).strftime("%Y-%m-%d")
-    hourly_vars = [
-        "temperature_2m",
-        "relative_humidity_2m",
-        "dewpoint_2m",
-        "apparent_temperature",
-        "cloudcover",
-        "cloudcover_low",
-        "windspeed_10m",
-        "winddirection_10m",
-        "surface_pressure",
-        "vapour_pressure_deficit",
-        "weathercode",
-        "wet_bulb_temperature_2m",
-        "precipitation",
-        "is_day",
-    ]
+model_registry = ModelRegistry(tracking_uri="http://127.0.0.1:5000")
+
+
+HOURLY_VARS = [
+    "temperature_2m",
+    "relative_humidity_2m",
+    "dewpoint_2m",
+    "apparent_temperature",
+    "cloudcover",
+    "cloudcover_low",
+    "windspeed_10m",
+    "winddirection_10m",
+    "surface_pressure",
+    "vapour_pressure_deficit",
+    "weathercode",
+    "wet_bulb_temperature_2m",
+    "precipitation",
+    "is_day",
+]
+
+
+def fetch_archive(start_date, end_date):
     params = {
         "latitude": 23.8103,
         "longitude": 90.4125,
-        "start_date": target_date,
-        "end_date": target_date,
-        "hourly": ",".join(hourly_vars),
+        "start_date": start_date,
+        "end_date": end_date,
+        "hourly": ",".join(HOURLY_VARS),
         "timezone": "Asia/Dhaka",
     }
-    logger.info(f"Fetching weather data for {target_date}...")
+    get_open_meteo().acquire("batch")
     res = requests.get("https://archive-api.open-meteo.com/v1/archive", params=params)
     res.raise_for_status()
+    record_bytes(len(res.content))
     return pd.DataFrame(res.json()["hourly"])
 
 
+# === Tasks ===
 @task
+@instrumented
+def fetch_weather_3_days_ago():
+    logger = get_run_logger()
+    target_date = (datetime.now(timezone.utc) - timedelta(days=3)).strftime("%Y-%m-%d")
+    logger.info(f"Fetching weather data for {target_date}...")
+    return fetch_archive(target_date, target_date)
+
+
+@task
+@instrumented
+def fetch_weather_range(start_date, end_date):
+    logger = get_run_logger()
+    logger.info(f"Fetching weather data from {start_date} to {end_date}...")
+    return fetch_archive(start_date, end_date)
+
+
+@task
+@instrumented
 def inspect_data_for_nans(df):
     logger = get_run_logger()
     logger.info("Inspecting data for missing values...")
@@ -77,6 +103,7 @@ def inspect_data_for_nans(df):
 
 
 @task
+@instrumented
 def engineer_features(df):
     df["time"] = pd.to_datetime(df["time"])
     df["hour"] = df["time"].dt.hour
@@ -108,35 +135,29 @@ def engineer_features(df):
 
 
 @task
+@instrumented
 def load_champion_model(model_name="dhaka_city_precipitation_xgb"):
     logger = get_run_logger()
-    client = MlflowClient()
-    latest_versions = client.get_latest_versions(model_name, stages=[])
-    if not latest_versions:
-        raise ValueError(f"No versions found for model '{model_name}'")
-
-    latest = sorted(latest_versions, key=lambda mv: int(mv.version))[-1]
-    model_uri = f"models:/{model_name}/{latest.version}"
-    model = mlflow.pyfunc.load_model(model_uri)
-    logger.info(f"Loaded model version {latest.version} from {model_uri}")
-    return model, latest.version  # returning model version also
+    champion = model_registry.resolve("champion", model_name)
+    model = mlflow.pyfunc.load_model(champion["model_uri"])
+    logger.info(
+        f"Loaded model version {champion['version']} from {champion['model_uri']}"
+    )
+    return model, champion["version"]  # returning model version also
 
 
 @task
+@instrumented
 def get_champion_metrics(model_name="dhaka_city_precipitation_xgb"):
     logger = get_run_logger()
-    latest_ver = sorted(
-        client.get_latest_versions(model_name, stages=[]),
-        key=lambda mv: int(mv.version),
-    )[-1]
-    run_id = latest_ver.run_id
-    run = client.get_run(run_id)
-    metrics = run.data.metrics
-    logger.info(f"Champion (latest) model metrics from run {run_id}: {metrics}")
+    champion = model_registry.resolve("champion", model_name)
+    metrics = champion["metrics"]
+    logger.info(f"Champion model metrics from run {champion['run_id']}: {metrics}")
     return metrics
 
 
 @task
+@instrumented
 def calculate_metrics(y_true, y_pred, model_version, city="Dhaka"):
     mae = mean_absolute_error(y_true, y_pred)
     mse = mean_squared_error(y_true, y_pred)
@@ -169,12 +190,88 @@ def calculate_metrics(y_true, y_pred, model_version, city="Dhaka"):
     g_r2.labels(model_version=str(model_version), city=city).set(r2)
 
     # Push to gateway
-    push_to_gateway("127.0.0.1:9091", job="model_monitoring", registry=registry)
+    push_with_retry(registry, job="model_monitoring")
 
     return {"mae": mae, "mse": mse, "r2": r2}
 
 
 @task
+@instrumented
+def calculate_day_metrics(day, y_true, y_pred):
+    """
+    MAE/MSE/R² of one day, or None when no precipitation was observed yet
+    (the archive lags the last few days).
+    """
+    mask = ~np.isnan(y_true)
+    if not mask.any():
+        return None
+    y_true, y_pred = y_true[mask], y_pred[mask]
+    return {
+        "date": day,
+        "rows": int(mask.sum()),
+        "mae": mean_absolute_error(y_true, y_pred),
+        "mse": mean_squared_error(y_true, y_pred),
+        "r2": r2_score(y_true, y_pred),
+    }
+
+
+@task
+@instrumented
+def push_backfill_metrics(
+    day_metrics, model_version, start_date, end_date, city="Dhaka"
+):
+    """
+    Push the metrics of every backfilled day in a single Pushgateway update.
+
+    The Pushgateway rejects client-side sample timestamps, so each day is a
+    `date` label and model_backfill_date_timestamp_seconds carries its time.
+    A push replaces its whole group, so each backfill range and model
+    version gets its own group; rerunning the same range replaces it.
+    """
+    registry = CollectorRegistry()
+    labels = ["model_version", "city", "date"]
+
+    gauges = {
+        metric: Gauge(
+            f"model_backfill_{metric}",
+            f"Backfilled daily {metric.upper()} of the model",
+            labels,
+            registry=registry,
+        )
+        for metric in ["mae", "mse", "r2"]
+    }
+    g_ts = Gauge(
+        "model_backfill_date_timestamp_seconds",
+        "Start of the backfilled day (Unix time)",
+        labels,
+        registry=registry,
+    )
+
+    for metrics in day_metrics:
+        label_values = {
+            "model_version": str(model_version),
+            "city": city,
+            "date": metrics["date"],
+        }
+        for metric, gauge in gauges.items():
+            gauge.labels(**label_values).set(metrics[metric])
+        g_ts.labels(**label_values).set(
+            pd.Timestamp(metrics["date"], tz="Asia/Dhaka").timestamp()
+        )
+
+    push_with_retry(
+        registry,
+        job="model_monitoring_backfill",
+        grouping_key={
+            "start_date": start_date,
+            "end_date": end_date,
+            "model_version": str(model_version),
+        },
+    )
+
+
+@task
+@instrumented
 def compare_metrics(current, logged, thresholds={"mae": 0.01, "mse": 0.01, "r2": 0.05}):
     logger = get_run_logger()
     logger.info("Comparing metrics...")
@@ -216,7 +313,11 @@ def compare_metrics(current, logged, thresholds={"mae": 0.01, "mse": 0.01, "r2":
 
 
 # === Flow ===
-@flow(name="drift_monitoring_flow")
+@flow(
+    name="drift_monitoring_flow",
+    on_completion=[pipeline_metrics_hook],
+    on_failure=[pipeline_metrics_hook],
+)
 def drift_monitoring_flow():
     logger = get_run_logger()
 
@@ -253,5 +354,79 @@ def drift_monitoring_flow():
     sendgrid_block.notify(message)
 
 
+@flow(
+    name="drift_backfill_flow",
+    on_completion=[pipeline_metrics_hook],
+    on_failure=[pipeline_metrics_hook],
+)
+def drift_backfill_flow(start_date: str, end_date: str):
+    """
+    Evaluate the champion on every day from start_date to end_date (inclusive).
+
+    One archive request and one predict cover the whole range; per-day metrics
+    are computed as mapped tasks and pushed together.
+    """
+    logger = get_run_logger()
+
+    df = fetch_weather_range(start_date, end_date)
+    inspect_data_for_nans(df)
+    days = pd.to_datetime(df["time"]).dt.strftime("%Y-%m-%d").to_numpy()
+    X, y = engineer_features(df)
+    model, model_version = load_champion_model()
+    y_pred = np.asarray(model.predict(X), dtype=float)
+    y_true = y.to_numpy(dtype=float)
+
+    unique_days = sorted(set(days))
+    results = calculate_day_metrics.map(
+        unique_days,
+        [y_true[days == day] for day in unique_days],
+        [y_pred[days == day] for day in unique_days],
+    ).result()
+    day_metrics = [m for m in results if m is not None]
+    skipped = [day for day, m in zip(unique_days, results) if m is None]
+    if skipped:
+        logger.warning(f"No observed precipitation yet, skipped: {', '.join(skipped)}")
+    if not day_metrics:
+        logger.warning(f"Nothing to backfill between {start_date} and {end_date}.")
+        return day_metrics
+    push_backfill_metrics(
+        day_metrics,
+        model_version=model_version,
+        start_date=start_date,
+        end_date=end_date,
+        city="Dhaka",
+    )
+
+    champion_metrics = get_champion_metrics()
+    drift_flags = compare_metrics.map(day_metrics, unmapped(champion_metrics)).result()
+    drift_days = [m["date"] for m, drifted in zip(day_metrics, drift_flags) if drifted]
+    logger.info(
+        f"Backfilled {len(day_metrics)} days, drift detected on {len(drift_days)}."
+    )
+
+    sendgrid_block = SendgridEmail.load(get_sendgrid_block())
+    sendgrid_block.notify(
+        f"Drift backfill {start_date} to {end_date} for model version {model_version}\n\n"
+        f"Days evaluated: {len(day_metrics)}\n"
+        f"Days with drift: {', '.join(drift_days) if drift_days else 'none'}\n"
+        f"Metrics then: {champion_metrics}"
+    )
+    return day_metrics
+
+
 if __name__ == "__main__":
-    drift_monitoring_flow()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Monitor model drift.")
+    parser.add_argument("--start-date", help="Backfill from this date (YYYY-MM-DD)")
+    parser.add_argument("--end-date", help="Backfill up to this date (YYYY-MM-DD)")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    if args.profile:
+        enable_task_profiling(args.profile)
+
+    if args.start_date and args.end_date:
+        drift_backfill_flow(args.start_date, args.end_date)
+    else:
+        drift_monitoring_flow()
@@ -0,0 +1,100 @@
+# precompute_forecasts.py
+# Refresh the forecasts /predict serves from a Prefect worker instead of the
+# serving container, whose CPU Cloud Run throttles outside requests.
+
+from prefect import flow, get_run_logger, task
+
+from utils.config import (
+    get_forecast_cache_url,
+    get_precompute_interval,
+    get_shadow_drain_timeout,
+)
+from utils.instrumentation import (
+    count_flow_event,
+    instrumented,
+    pipeline_metrics_hook,
+    push_with_retry,
+)
+from utils.profiling import add_profile_argument, enable_task_profiling
+
+
+@task
+@instrumented
+def precompute_forecasts(min_age):
+    # Imported here: app.predict loads the champion model at import time
+    from app.precompute import precompute_all
+
+    return precompute_all(min_age=min_age)
+
+
+@task
+@instrumented
+def maintain_prediction_history():
+    from app.precompute import maintain_history
+
+    maintain_history()
+
+
+@task
+@instrumented
+def drain_shadow(timeout):
+    """
+    Let the challenger finish the forecasts queued by this run and push its metrics.
+
+    The flow process exits when the flow returns, which would kill the shadow
+    worker mid-job, and it has no /metrics endpoint for Prometheus to scrape.
+    """
+    from app.predict import shadow
+    from app.shadow import shadow_registry
+
+    if shadow is None:
+        return None
+    drained = shadow.drain(timeout)
+    if not drained:
+        get_run_logger().warning(
+            f"Shadow queue not drained after {timeout:g}s, "
+            f"{shadow.queue.unfinished_tasks} jobs abandoned"
+        )
+    push_with_retry(shadow_registry(), job="forecast_precompute_shadow")
+    return drained
+
+
+@flow(on_completion=[pipeline_metrics_hook], on_failure=[pipeline_metrics_hook])
+def precompute_forecasts_flow():
+    """
+    Compute the forecast of every FORECAST_LOCATIONS entry into the shared store.
+
+    Needs FORECAST_CACHE_URL pointing at the same store as the API; locations
+    an API replica refreshed within the last half interval are skipped.
+    """
+    logger = get_run_logger()
+    url = get_forecast_cache_url()
+    if not url or url.startswith("memory://"):
+        raise ValueError(
+            "FORECAST_CACHE_URL must point at the forecast store the API reads "
+            "(e.g. redis://host:6379/0); a local or in-process store does not reach it."
+        )
+
+    outcomes = precompute_forecasts(min_age=get_precompute_interval() / 2)
+    drain_shadow(get_shadow_drain_timeout())
+    maintain_prediction_history()
+
+    for outcome in outcomes.values():
+        count_flow_event(f"forecasts_{outcome}")
+    failed = [name for name, outcome in outcomes.items() if outcome == "failed"]
+    logger.info(f"Precomputed forecasts: {outcomes}")
+    if failed and len(failed) == len(outcomes):
+        raise RuntimeError(f"Precomputing failed for every location: {failed}")
+    return outcomes
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precompute served forecasts.")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    if args.profile:
+        enable_task_profiling(args.profile)
+    precompute_forecasts_flow()
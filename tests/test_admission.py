@@ -0,0 +1,88 @@
+# tests/test_admission.py
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+
+from app.admission import AdmissionController, Coalescer, Overloaded
+
+
+async def hold(controller, seconds):
+    async with controller.admit():
+        await asyncio.sleep(seconds)
+    return "ok"
+
+
+def gather(*coros):
+    async def run():
+        return await asyncio.gather(*coros, return_exceptions=True)
+
+    return asyncio.run(run())
+
+
+def test_sheds_requests_beyond_the_wait_queue():
+    controller = AdmissionController(max_concurrent=2, max_queue=1, max_wait=1)
+
+    results = gather(*(hold(controller, 0.05) for _ in range(4)))
+
+    assert results[:3] == ["ok", "ok", "ok"]
+    assert isinstance(results[3], Overloaded) and results[3].reason == "queue_full"
+    assert controller.active == 0
+
+
+def test_sheds_requests_that_wait_too_long():
+    controller = AdmissionController(
+        max_concurrent=1, max_queue=5, max_wait=0.05, retry_after=3
+    )
+
+    results = gather(hold(controller, 0.3), hold(controller, 0))
+
+    assert results[0] == "ok"
+    assert results[1].reason == "timeout" and results[1].retry_after == 3
+    assert controller.active == 0
+    assert asyncio.run(hold(controller, 0)) == "ok"
+
+
+def test_coalesces_identical_in_flight_calls():
+    coalescer = Coalescer()
+    calls = []
+
+    async def compute(key):
+        calls.append(key)
+        await asyncio.sleep(0.05)
+        if key == "bad":
+            raise KeyError(key)
+        return key.upper()
+
+    results = gather(
+        *(coalescer.run(key, compute, key) for key in ["a"] * 5 + ["b", "bad", "bad"])
+    )
+
+    assert results[:6] == ["A"] * 5 + ["B"]
+    assert all(isinstance(r, KeyError) for r in results[6:])
+    assert sorted(calls) == ["a", "b", "bad"]
+    # Finished calls are not reused
+    assert gather(coalescer.run("a", compute, "a")) == ["A"]
+    assert calls.count("a") == 2
+
+
+def test_queue_is_fifo():
+    controller = AdmissionController(max_concurrent=1, max_queue=10, max_wait=1)
+    order = []
+
+    async def tracked(i):
+        async with controller.admit():
+            order.append(i)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        tasks = []
+        for i in range(5):
+            tasks.append(asyncio.ensure_future(tracked(i)))
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order == [0, 1, 2, 3, 4]
@@ -0,0 +1,52 @@
+# tests/test_caching.py
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from utils.caching import fingerprint, with_settings
+
+
+def test_fingerprint_is_stable_for_equal_content():
+    df1 = pd.DataFrame({"a": [1.0, 2.0], "b": ["x", "y"]})
+    df2 = pd.DataFrame({"a": [1.0, 2.0], "b": ["x", "y"]})
+
+    assert fingerprint(df1) == fingerprint(df2)
+    assert fingerprint({"max_depth": [7], "eta": [0.01]}) == fingerprint(
+        {"eta": [0.01], "max_depth": [7]}
+    )
+
+
+def test_fingerprint_changes_with_content_and_dtype():
+    df = pd.DataFrame({"a": [1, 2]})
+
+    assert fingerprint(df) != fingerprint(pd.DataFrame({"a": [1, 3]}))
+    assert fingerprint(df) != fingerprint(df.astype("float64"))
+    assert fingerprint(np.zeros(3)) != fingerprint(np.zeros(4))
+    assert fingerprint({"max_depth": [7]}) != fingerprint({"max_depth": [5]})
+
+
+def test_fingerprint_covers_fitted_model_weights():
+    X = np.arange(40, dtype=float).reshape(20, 2)
+    first = xgb.XGBRegressor(n_estimators=3).fit(X, X[:, 0])
+    second = xgb.XGBRegressor(n_estimators=3).fit(X, X[:, 1])
+
+    assert repr(first) == repr(second)
+    assert fingerprint(first) != fingerprint(second)
+
+
+def test_settings_are_part_of_the_cache_key():
+    settings = {"train_workers": 1, "mlflow_tracking_uri": "http://a:5000"}
+    key_fn = with_settings(lambda context, parameters: "inputs", lambda: dict(settings))
+
+    local = key_fn(None, {})
+    settings["train_workers"] = 4
+    distributed = key_fn(None, {})
+    settings["mlflow_tracking_uri"] = "http://b:5000"
+
+    assert len({local, distributed, key_fn(None, {})}) == 3
+    assert with_settings(lambda context, parameters: None, dict)(None, {}) is None
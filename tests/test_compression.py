@@ -0,0 +1,67 @@
+# tests/test_compression.py
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from utils.compression import (
+    best_within_budget,
+    pareto_front,
+    promotion_decision,
+    rank_features,
+)
+
+CANDIDATES = [
+    {"name": "full", "mae": 0.10, "latency_ms": 2.0},
+    {"name": "slow_and_worse", "mae": 0.12, "latency_ms": 2.5},
+    {"name": "small", "mae": 0.13, "latency_ms": 0.5},
+    {"name": "medium", "mae": 0.11, "latency_ms": 1.0},
+    {"name": "dominated", "mae": 0.14, "latency_ms": 1.0},
+]
+
+
+def test_pareto_front_keeps_only_non_dominated_sorted_by_latency():
+    front = pareto_front(CANDIDATES)
+
+    assert [c["name"] for c in front] == ["small", "medium", "full"]
+
+
+def test_best_within_budget():
+    front = pareto_front(CANDIDATES)
+
+    assert best_within_budget(front, 1.5)["name"] == "medium"
+    assert best_within_budget(front, 0.1) is None
+
+
+def test_rank_features_puts_informative_feature_first():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(500, 3)), columns=["noise", "signal", "weak"])
+    y = 3 * X["signal"] + 0.3 * X["weak"]
+    model = xgb.XGBRegressor(n_estimators=30, max_depth=3).fit(X, y)
+
+    ranking = rank_features(model, X)
+
+    assert list(ranking["feature"])[0] == "signal"
+    assert set(ranking.columns) == {"feature", "mean_abs_shap", "total_gain"}
+
+
+def test_promotion_rule():
+    champion = {"mae": 0.10, "predict_latency_ms": 1.0}
+
+    # No champion yet: promote even over budget
+    assert promotion_decision(0.2, 9.0, None, latency_budget_ms=2.0)[0]
+    # Better MAE within budget, or with no budget
+    assert promotion_decision(0.09, 1.5, champion, 2.0)[0]
+    assert promotion_decision(0.09, 9.0, champion, None)[0]
+    assert not promotion_decision(0.11, 1.0, champion, 2.0)[0]
+    # Over budget while the champion fits (or its latency is unknown)
+    assert not promotion_decision(0.05, 3.0, champion, 2.0)[0]
+    assert not promotion_decision(0.05, 3.0, {"mae": 0.10}, 2.0)[0]
+    # Champion over budget too: no slower and better MAE still wins
+    slow_champion = {"mae": 0.10, "predict_latency_ms": 4.0}
+    assert promotion_decision(0.09, 3.0, slow_champion, 2.0)[0]
+    assert not promotion_decision(0.09, 5.0, slow_champion, 2.0)[0]
@@ -0,0 +1,27 @@
+# tests/test_distributed.py
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+pytest.importorskip("dask.distributed")
+
+from utils.distributed import fit_distributed
+
+
+def test_fit_distributed_returns_plain_regressor():
+    rng = np.random.default_rng(42)
+    X = pd.DataFrame(rng.normal(size=(500, 3)), columns=["a", "b", "c"])
+    y = 2 * X["a"] + rng.normal(scale=0.1, size=500)
+
+    model = fit_distributed(X, y, {"n_estimators": 20, "max_depth": 3}, n_workers=2)
+
+    assert isinstance(model, xgb.XGBRegressor)
+    preds = model.predict(X)
+    assert preds.shape == (500,)
+    assert np.abs(preds - y).mean() < 0.5
@@ -0,0 +1,54 @@
+# tests/test_drift_backfill.py
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import prometheus_client
+
+from monitor_drift import calculate_day_metrics, push_backfill_metrics
+
+
+def test_day_metrics_ignore_missing_observations():
+    y_true = np.array([0.0, np.nan, 2.0, 1.0])
+    y_pred = np.array([0.5, 9.0, 2.0, 1.0])
+
+    metrics = calculate_day_metrics.fn("2025-06-01", y_true, y_pred)
+
+    assert metrics["rows"] == 3
+    assert np.isclose(metrics["mae"], 0.5 / 3)
+
+
+def test_day_without_observations_is_skipped():
+    y_true = np.full(24, np.nan)
+
+    assert calculate_day_metrics.fn("2025-06-30", y_true, np.zeros(24)) is None
+
+
+def test_backfills_of_different_ranges_do_not_replace_each_other(monkeypatch):
+    groups = {}
+
+    # A push replaces everything in its (job, grouping key) group
+    def push_to_gateway(gateway, job, registry, grouping_key, timeout):
+        key = (job, tuple(sorted(grouping_key.items())))
+        groups[key] = {
+            sample.labels["date"]
+            for metric in registry.collect()
+            for sample in metric.samples
+        }
+
+    monkeypatch.setattr(prometheus_client, "push_to_gateway", push_to_gateway)
+    day = {"mae": 0.1, "mse": 0.01, "r2": 0.5}
+    push_backfill_metrics.fn(
+        [{**day, "date": "2025-06-01"}], "3", "2025-06-01", "2025-06-01"
+    )
+    push_backfill_metrics.fn(
+        [{**day, "date": "2025-06-02"}], "3", "2025-06-02", "2025-06-02"
+    )
+
+    assert len(groups) == 2
+    assert sorted(date for dates in groups.values() for date in dates) == [
+        "2025-06-01",
+        "2025-06-02",
+    ]
@@ -0,0 +1,72 @@
+# tests/test_encoding.py
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import msgpack
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from app.encoding import (
+    ARROW,
+    JSON,
+    MSGPACK,
+    encode_arrow,
+    encode_msgpack,
+    negotiate,
+    to_records,
+)
+
+
+def make_forecast():
+    return {
+        "timestamp": np.array(
+            ["2025-06-01T00:00", "2025-06-01T01:00"], dtype="datetime64[ns]"
+        ),
+        "predicted_precipitation": np.array([0.0, 1.25]),
+    }
+
+
+def test_negotiate_defaults_to_json():
+    assert negotiate(None) == JSON
+    assert negotiate("*/*") == JSON
+    assert negotiate("text/html, */*;q=0.8") == JSON
+
+
+def test_negotiate_respects_quality_values():
+    assert negotiate(ARROW) == ARROW
+    assert negotiate(f"{JSON};q=0.5, {MSGPACK};q=0.9") == MSGPACK
+    assert negotiate(f"{ARROW};q=0, {JSON}") == JSON
+    assert negotiate("text/csv") is None
+
+
+def test_json_records_keep_existing_shape():
+    records = to_records(make_forecast())
+
+    assert records[1] == {
+        "timestamp": pd.Timestamp("2025-06-01T01:00"),
+        "predicted_precipitation": 1.25,
+        "unit": "mm",
+    }
+
+
+def test_arrow_round_trip():
+    table = pa.ipc.open_stream(encode_arrow(make_forecast())).read_all()
+
+    assert table.column_names == ["timestamp", "predicted_precipitation"]
+    assert table.schema.metadata == {b"unit": b"mm"}
+    assert table["predicted_precipitation"].to_pylist() == [0.0, 1.25]
+    assert table.schema.field("timestamp").type.tz == "Asia/Dhaka"
+    # 2025-06-01T00:00 in Dhaka (UTC+6) is 2025-05-31T18:00 UTC
+    assert table["timestamp"][0].as_py() == pd.Timestamp("2025-05-31T18:00Z")
+
+
+def test_msgpack_round_trip():
+    payload = msgpack.unpackb(encode_msgpack(make_forecast()))
+
+    assert payload["unit"] == "mm"
+    assert payload["predicted_precipitation"] == [0.0, 1.25]
+    assert payload["timezone"] == "Asia/Dhaka"
+    assert payload["timestamp"] == [1_748_714_400_000, 1_748_718_000_000]
@@ -0,0 +1,88 @@
+# tests/test_forecast_store.py
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pytest
+
+from app.store import ForecastStore, decode_forecast, encode_forecast, make_store
+
+
+def make_forecast():
+    return {
+        "timestamp": np.arange(
+            "2025-06-01T00", "2025-06-02T00", dtype="datetime64[h]"
+        ).astype("datetime64[ns]"),
+        "predicted_precipitation": np.linspace(0, 2.3, 24),
+    }
+
+
+def test_put_and_get_round_trip(tmp_path):
+    store = ForecastStore(str(tmp_path))
+    forecast = make_forecast()
+
+    generated_at = store.put("dhaka", forecast, generated_at=1_750_000_000.0)
+    stored, stored_at = store.get("dhaka")
+
+    assert generated_at == stored_at == 1_750_000_000.0
+    np.testing.assert_array_equal(stored["timestamp"], forecast["timestamp"])
+    np.testing.assert_array_equal(
+        stored["predicted_precipitation"], forecast["predicted_precipitation"]
+    )
+    assert [p.name for p in tmp_path.iterdir()] == ["dhaka.npz"]
+
+
+def test_get_missing_key_returns_none(tmp_path):
+    assert ForecastStore(str(tmp_path)).get("chittagong") is None
+
+
+def test_encoded_forecast_is_compact_and_round_trips():
+    forecast = make_forecast()
+    forecast["predicted_precipitation"] = np.round(
+        forecast["predicted_precipitation"], 2
+    )
+
+    data = encode_forecast(forecast, 1_750_000_000.0)
+    decoded, generated_at = decode_forecast(data)
+
+    assert len(data) == 129
+    assert generated_at == 1_750_000_000.0
+    np.testing.assert_array_equal(decoded["timestamp"], forecast["timestamp"])
+    np.testing.assert_array_equal(
+        decoded["predicted_precipitation"], forecast["predicted_precipitation"]
+    )
+
+    irregular = {k: v[[0, 1, 5]] for k, v in forecast.items()}
+    decoded, _ = decode_forecast(encode_forecast(irregular, 0.0))
+    np.testing.assert_array_equal(decoded["timestamp"], irregular["timestamp"])
+
+
+@pytest.mark.parametrize("kind", ["file", "memory", "redis"])
+def test_lock_admits_one_refresher(kind, tmp_path):
+    if kind == "redis":
+        url = os.getenv("REDIS_URL")
+        if not url:
+            pytest.skip("REDIS_URL is not set")
+        redis = pytest.importorskip("redis")
+        try:
+            redis.Redis.from_url(url).ping()
+        except redis.ConnectionError:
+            pytest.skip(f"No Redis server at {url}")
+        store = make_store(url, str(tmp_path), ttl_seconds=60)
+        store.prefix = f"test-{tmp_path.name}:"
+    else:
+        store = make_store("memory://" if kind == "memory" else None, str(tmp_path))
+
+    with store.lock("dhaka", ttl=5) as first:
+        with store.lock("dhaka", ttl=5) as second:
+            assert first and not second
+        with store.lock("sylhet", ttl=5) as other:
+            assert other
+    with store.lock("dhaka", ttl=5) as again:
+        assert again
+
+    assert store.get("dhaka") is None
+    store.put("dhaka", make_forecast(), generated_at=10.0)
+    assert store.get("dhaka")[1] == 10.0
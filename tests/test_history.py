@@ -0,0 +1,111 @@
+# tests/test_history.py
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.history import PredictionHistory, SqlPredictionHistory, make_history
+
+
+def forecast(start, value, periods=24):
+    return {
+        "timestamp": np.asarray(
+            pd.date_range(start, periods=periods, freq="h"), dtype="datetime64[ns]"
+        ),
+        "predicted_precipitation": np.full(periods, value, dtype="float64"),
+    }
+
+
+def test_query_spans_month_partitions(tmp_path):
+    history = PredictionHistory(str(tmp_path))
+    history.append("dhaka", forecast("2025-06-30 12:00", 1.0), "3", generated_at=100)
+    history.append("dhaka", forecast("2025-06-30 13:00", 2.0), "4", generated_at=200)
+    history.append("sylhet", forecast("2025-06-30 12:00", 9.0), "4", generated_at=200)
+
+    assert sorted(history.partitions()) == [(2025, 6), (2025, 7)]
+
+    df = history.query("dhaka", "2025-06-30 23:00", "2025-07-01 01:00")
+    assert len(df) == 6
+    assert df["target_hour"].is_monotonic_increasing
+    assert set(df["model_version"]) == {"3", "4"}
+
+    latest = history.query("dhaka", "2025-06-30 23:00", "2025-07-01 01:00", latest=True)
+    assert len(latest) == 6  # one per hour and model version
+
+    v3 = history.query("dhaka", "2025-06-30", "2025-07-02", model_version="3")
+    assert len(v3) == 24 and (v3["predicted_precipitation"] == 1.0).all()
+
+
+def test_maintain_drops_and_compacts_old_partitions(tmp_path):
+    history = PredictionHistory(str(tmp_path))
+    for generated_at in (100, 200):
+        history.append("dhaka", forecast("2025-01-10", generated_at), "3", generated_at)
+        history.append("dhaka", forecast("2025-05-10", generated_at), "3", generated_at)
+        history.append("dhaka", forecast("2025-07-10", generated_at), "3", generated_at)
+
+    dropped, compacted = history.maintain(
+        retention_days=120, compact_after_days=30, now="2025-07-20"
+    )
+
+    assert (dropped, compacted) == (1, 1)
+    assert sorted(history.partitions()) == [(2025, 5), (2025, 7)]
+    may = history.query("dhaka", "2025-05-01", "2025-05-31")
+    assert len(may) == 24 and (may["generated_at"] == 200).all()
+    assert len(history.query("dhaka", "2025-07-01", "2025-07-31")) == 48
+    assert history.maintain(120, 30, now="2025-07-20") == (0, 0)
+
+
+def sql_history(kind, tmp_path):
+    if kind == "sqlite":
+        return SqlPredictionHistory(f"sqlite:///{tmp_path / 'history.sqlite3'}")
+    url = os.getenv("POSTGRES_URL")
+    if not url:
+        pytest.skip("POSTGRES_URL is not set")
+    sa = pytest.importorskip("sqlalchemy")
+    with sa.create_engine(url).begin() as db:
+        db.execute(
+            sa.text(
+                "DROP TABLE IF EXISTS prediction_history, prediction_history_compacted"
+            )
+        )
+    return SqlPredictionHistory(url)
+
+
+@pytest.mark.parametrize("kind", ["sqlite", "postgresql"])
+def test_sql_history_matches_partitioned_history(kind, tmp_path):
+    history = sql_history(kind, tmp_path)
+    for generated_at in (100, 200):
+        history.append("dhaka", forecast("2025-01-10", generated_at), "3", generated_at)
+        history.append("dhaka", forecast("2025-05-10", generated_at), "3", generated_at)
+        history.append("dhaka", forecast("2025-07-10", generated_at), "3", generated_at)
+    history.append("dhaka", forecast("2025-07-10", 5.0), "4", generated_at=150)
+
+    latest = history.query("dhaka", "2025-07-10", "2025-07-10 23:00", latest=True)
+    assert len(latest) == 48  # one per hour and model version
+    assert set(latest.loc[latest["model_version"] == "3", "generated_at"]) == {200}
+
+    assert history.maintain(
+        retention_days=120, compact_after_days=30, now="2025-07-20"
+    ) == (1, 1)
+    assert history.query("dhaka", "2025-01-01", "2025-01-31").empty
+    may = history.query("dhaka", "2025-05-01", "2025-05-31")
+    assert len(may) == 24 and (may["generated_at"] == 200).all()
+    assert len(history.query("dhaka", "2025-07-01", "2025-07-31")) == 72
+    assert history.maintain(120, 30, now="2025-07-20") == (0, 0)
+    if history.partitioned:
+        assert sorted(history.partitions()) == [(2025, 5), (2025, 7)]
+
+
+def test_shared_store_refuses_temporary_history_dir(tmp_path):
+    with pytest.raises(ValueError, match="PREDICTION_HISTORY_URL"):
+        make_history(None, "/tmp/prediction-history", shared_store=True)
+
+    assert isinstance(make_history(None, "/tmp/prediction-history"), PredictionHistory)
+    url = f"sqlite:///{tmp_path / 'history.sqlite3'}"
+    assert isinstance(
+        make_history(url, "/tmp/prediction-history", True), SqlPredictionHistory
+    )
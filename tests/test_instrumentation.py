@@ -0,0 +1,74 @@
+# tests/test_instrumentation.py
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import instrumentation
+from utils.instrumentation import instrumented, record_bytes, summarize_records
+
+
+@pytest.fixture(autouse=True)
+def clear_records():
+    instrumentation._records.clear()
+    yield
+    instrumentation._records.clear()
+
+
+def test_instrumented_records_rows_bytes_and_timings():
+    @instrumented
+    def load():
+        record_bytes(1024)
+        return pd.DataFrame({"a": range(10)}), None
+
+    X, _ = load()
+    load()
+
+    assert len(X) == 10
+    summary = summarize_records(instrumentation._records)
+    assert summary["load"]["calls"] == 2
+    assert summary["load"]["rows"] == 20
+    assert summary["load"]["bytes"] == 2048
+    assert summary["load"]["wall_seconds"] >= 0
+    assert summary["load"]["peak_rss_bytes"] > 0
+
+
+def test_instrumented_records_failures():
+    @instrumented
+    def broken():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        broken()
+
+    summary = summarize_records(instrumentation._records)
+    assert summary["broken"]["failures"] == 1
+
+
+def test_record_bytes_outside_task_is_noop():
+    record_bytes(10)
+    assert instrumentation._records == []
+
+
+@pytest.mark.skipif(
+    not os.access("/proc/self/clear_refs", os.W_OK),
+    reason="needs /proc/self/clear_refs",
+)
+def test_peak_rss_is_measured_per_task():
+    @instrumented
+    def big():
+        return np.ones(5_000_000).sum()  # ~40 MB while running
+
+    @instrumented
+    def small():
+        return np.ones(10).sum()
+
+    big()
+    small()
+
+    big_record, small_record = instrumentation._records
+    assert big_record["peak_rss_bytes"] - small_record["peak_rss_bytes"] > 25e6
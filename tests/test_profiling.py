@@ -0,0 +1,59 @@
+# tests/test_profiling.py
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import threading
+import time
+
+from utils import profiling
+from utils.profiling import StackSampler, profile_task, sampled_profile
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_stack_sampler_writes_folded_stacks(tmp_path):
+    with StackSampler(threading.get_ident(), interval=0.001) as sampler:
+        busy(0.05)
+
+    path = tmp_path / "busy.folded"
+    sampler.write_folded(str(path))
+
+    lines = path.read_text().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert "busy (test_profiling.py" in stack
+    assert int(count) > 0
+
+
+def test_sampled_profile_respects_sample_rate(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    monkeypatch.setitem(profiling.settings, "sample_rate", 0.0)
+
+    @sampled_profile("endpoint")
+    def endpoint():
+        busy(0.01)
+        return "ok"
+
+    assert endpoint() == "ok"
+    assert list(tmp_path.iterdir()) == []
+
+    monkeypatch.setitem(profiling.settings, "sample_rate", 1.0)
+    assert endpoint() == "ok"
+    assert [p.suffix for p in tmp_path.iterdir()] == [".folded"]
+
+
+def test_profile_task_writes_pstats_and_report(tmp_path, monkeypatch):
+    monkeypatch.setitem(profiling.settings, "task_profile_dir", str(tmp_path))
+
+    with profile_task("outer"):
+        with profile_task("inner"):
+            busy(0.01)
+
+    assert sorted(p.suffix for p in tmp_path.iterdir()) == [".pstats", ".txt"]
+    assert all(p.name.startswith("outer-") for p in tmp_path.iterdir())
@@ -0,0 +1,87 @@
+# tests/test_ratelimit.py
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import threading
+import time
+
+import pytest
+
+from utils.ratelimit import (
+    RateLimitTimeout,
+    SharedRateLimiter,
+    get_open_meteo,
+    make_rate_limiter,
+)
+
+BUDGETS = {"serving": {"minute": 2, "day": 100}, "batch": {"minute": 60}}
+
+
+def make_limiter(kind, tmp_path, budgets, poll_interval=0.5):
+    if kind == "redis":
+        url = os.getenv("REDIS_URL")
+        if not url:
+            pytest.skip("REDIS_URL is not set")
+        redis = pytest.importorskip("redis")
+        try:
+            redis.Redis.from_url(url).ping()
+        except redis.ConnectionError:
+            pytest.skip(f"No Redis server at {url}")
+    else:
+        url = None
+    limiter = make_rate_limiter(url, str(tmp_path / "limits.sqlite3"), budgets)
+    limiter.poll_interval = poll_interval
+    if kind == "redis":
+        # Fresh buckets per run, shared by the limiters of one test
+        limiter.prefix = f"test-{tmp_path}:"
+    return limiter
+
+
+@pytest.mark.parametrize("kind", ["sqlite", "redis"])
+def test_bucket_is_shared_between_limiters(kind, tmp_path):
+    first = make_limiter(kind, tmp_path, BUDGETS)
+    second = make_limiter(kind, tmp_path, BUDGETS)
+
+    first.acquire("serving", timeout=0)
+    second.acquire("serving", timeout=0)
+    with pytest.raises(RateLimitTimeout) as excinfo:
+        first.acquire("serving", timeout=0)
+
+    assert 0 < excinfo.value.retry_after <= 30
+    assert second.remaining("serving")["day"] == pytest.approx(98, abs=0.01)
+    # Budgets are independent
+    assert second.acquire("batch", timeout=0) >= 0
+
+
+@pytest.mark.parametrize("kind", ["sqlite", "redis"])
+def test_batch_yields_to_waiting_serving_call(kind, tmp_path):
+    budgets = {"serving": {"second": 2}, "batch": {"minute": 60}}
+    limiter = make_limiter(kind, tmp_path, budgets, poll_interval=0.05)
+    limiter.acquire("serving", timeout=0)
+    limiter.acquire("serving", timeout=0)
+
+    # Serving needs ~0.5s for its next token; batch has tokens but must wait
+    waiting = threading.Thread(target=limiter.acquire, args=("serving", 5))
+    waiting.start()
+    time.sleep(0.1)
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire("batch", timeout=0.2)
+    waiting.join()
+
+    assert limiter.acquire("batch", timeout=0) >= 0
+
+
+def test_limiter_is_built_on_first_use(tmp_path, monkeypatch):
+    path = tmp_path / "limits.sqlite3"
+    monkeypatch.setenv("OPEN_METEO_RATE_LIMIT_DB", str(path))
+    monkeypatch.delenv("OPEN_METEO_RATE_LIMIT_URL", raising=False)
+    get_open_meteo.cache_clear()
+    try:
+        assert not path.exists()
+        limiter = get_open_meteo()
+        assert isinstance(limiter, SharedRateLimiter)
+        assert limiter.path == str(path) and get_open_meteo() is limiter
+    finally:
+        get_open_meteo.cache_clear()
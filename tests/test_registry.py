@@ -0,0 +1,87 @@
+# tests/test_registry.py
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import threading
+from types import SimpleNamespace
+
+from utils.registry import ModelRegistry
+
+
+class FakeClient:
+    def __init__(self):
+        self.aliases = {"champion": "3"}
+        self.calls = []
+
+    def get_model_version_by_alias(self, name, alias):
+        self.calls.append("get_model_version_by_alias")
+        version = self.aliases[alias]
+        return SimpleNamespace(version=version, run_id=f"run-{version}")
+
+    def get_run(self, run_id):
+        self.calls.append("get_run")
+        return SimpleNamespace(
+            data=SimpleNamespace(metrics={"mae": 0.5}, params={"max_depth": "7"}),
+            info=SimpleNamespace(artifact_uri=f"gs://bucket/{run_id}/artifacts"),
+        )
+
+    def set_registered_model_alias(self, name, alias, version):
+        self.calls.append("set_registered_model_alias")
+        self.aliases[alias] = version
+
+
+def make_registry(ttl_seconds=300):
+    registry = ModelRegistry(ttl_seconds=ttl_seconds)
+    registry._client = FakeClient()
+    return registry
+
+
+def test_resolve_returns_version_metrics_and_uris_in_one_lookup():
+    registry = make_registry()
+
+    info = registry.resolve("champion")
+
+    assert info["version"] == "3"
+    assert info["metrics"] == {"mae": 0.5}
+    assert info["model_uri"] == "runs:/run-3/model"
+    assert info["artifact_uri"] == "gs://bucket/run-3/artifacts"
+    assert registry.calls == 2
+
+
+def test_resolve_is_cached_until_ttl():
+    registry = make_registry()
+    registry.resolve("champion")
+    registry.resolve("champion")
+    assert registry.calls == 2
+
+    expired = make_registry(ttl_seconds=0)
+    expired.resolve("champion")
+    expired.resolve("champion")
+    assert expired.calls == 4
+
+
+def test_set_alias_invalidates_cached_alias():
+    registry = make_registry()
+    assert registry.resolve("champion")["version"] == "3"
+
+    registry.set_alias("champion", 4)
+
+    assert registry.resolve("champion")["version"] == "4"
+
+
+def test_calls_are_counted_across_threads():
+    registry = make_registry(ttl_seconds=0)
+
+    def resolve_many():
+        for _ in range(200):
+            registry.resolve("champion")
+
+    threads = [threading.Thread(target=resolve_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert registry.calls == 8 * 200 * 2
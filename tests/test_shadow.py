@@ -0,0 +1,81 @@
+# tests/test_shadow.py
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import threading
+
+import numpy as np
+import xgboost as xgb
+
+from app.shadow import SHADOW_DROPPED, ShadowRunner, pin_single_thread, shadow_registry
+
+
+class BlockingModel:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def predict(self, X):
+        self.release.wait(timeout=5)
+        return np.asarray(X["x"], dtype=float) * 2
+
+
+def test_shadow_logs_both_predictions(tmp_path):
+    model = BlockingModel()
+    model.release.set()
+    log_path = tmp_path / "shadow.jsonl"
+    runner = ShadowRunner(model, str(log_path), versions={"challenger": "5"})
+
+    assert runner.submit({"x": [1.0, 2.0]}, np.array([1.5, 3.5]), location="dhaka")
+    runner.queue.join()
+
+    record = json.loads(log_path.read_text())
+    assert record["champion"] == [1.5, 3.5]
+    assert record["challenger"] == [2.0, 4.0]
+    assert record["challenger_version"] == "5"
+    assert record["location"] == "dhaka"
+
+
+def test_submit_drops_instead_of_blocking_when_queue_is_full(tmp_path):
+    model = BlockingModel()
+    runner = ShadowRunner(model, str(tmp_path / "shadow.jsonl"), max_queue=1)
+    dropped_before = SHADOW_DROPPED._value.get()
+
+    results = [runner.submit({"x": [1.0]}, np.array([1.0])) for _ in range(5)]
+    model.release.set()
+    runner.queue.join()
+
+    assert results[0] is True
+    assert results.count(False) >= 3
+    assert SHADOW_DROPPED._value.get() - dropped_before == results.count(False)
+
+
+def test_drain_waits_for_queued_jobs(tmp_path):
+    model = BlockingModel()
+    runner = ShadowRunner(model, str(tmp_path / "shadow.jsonl"))
+    runner.submit({"x": [1.0]}, np.array([1.0]))
+
+    assert runner.drain(timeout=0.05) is False
+    model.release.set()
+    assert runner.drain(timeout=5) is True
+    assert (tmp_path / "shadow.jsonl").read_text().count("\n") == 1
+
+    pushed = {metric.name for metric in shadow_registry().collect()}
+    assert {"shadow_predictions", "shadow_cpu_seconds"} <= pushed
+
+
+def test_challenger_is_pinned_to_one_thread(tmp_path):
+    X = np.random.default_rng(0).random((200, 3))
+    model = xgb.XGBRegressor(n_estimators=5, n_jobs=4).fit(X, X[:, 0])
+
+    class PyFunc:
+        def get_raw_model(self):
+            return model
+
+    runner = ShadowRunner(PyFunc(), str(tmp_path / "shadow.jsonl"))
+    assert runner.single_threaded
+    assert model.get_params()["n_jobs"] == 1
+    assert pin_single_thread(model.get_booster())
+    assert not pin_single_thread(BlockingModel())
@@ -16,32 +16,104 @@ import pandas as pd
 import xgboost as xgb
 from google.cloud import storage
 from mlflow.models import infer_signature
-from mlflow.tracking import MlflowClient
 from prefect import flow, get_run_logger, task
 from prefect.blocks.notifications import SendgridEmail
-from prometheus_client import CollectorRegistry, Gauge, push_to_gateway
+from prometheus_client import CollectorRegistry, Gauge
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-from sklearn.model_selection import GridSearchCV, train_test_split
+from sklearn.model_selection import GridSearchCV, ParameterGrid, train_test_split
+
+from utils.caching import cached_task_options, gcs_blob_cache_key, local_copy_matches
+from utils.compression import (
+    best_within_budget,
+    pareto_front,
+    predict_latency_ms,
+    promotion_decision,
+    rank_features,
+)
+from utils.config import (
+    get_bucket_name,
+    get_dask_scheduler_address,
+    get_latency_budget_ms,
+    get_sendgrid_block,
+    get_train_workers,
+)
+from utils.distributed import fit_distributed
+from utils.instrumentation import (
+    instrumented,
+    pipeline_metrics_hook,
+    push_with_retry,
+    record_bytes,
+)
+from utils.profiling import add_profile_argument, enable_task_profiling
+from utils.registry import ModelRegistry
+
+model_registry = ModelRegistry(
+    tracking_uri=os.getenv("MLFLOW_TRACKING_URI", "http://127.0.0.1:5000")
+)
+
+PARAM_GRID = {
+    "n_estimators": [200],
+    "max_depth": [7],
+    "learning_rate": [0.01],
+    "subsample": [0.8],
+    "colsample_bytree": [0.8],
+}
+
+# Candidate grid of the optional model compression stage
+COMPRESSION_GRID = {
+    "top_k_features": [None, 20, 15, 10],
+    "max_depth": [7, 5, 3],
+    "n_estimators": [200, 100],
+}
+
+
+def get_mlflow_tracking_uri():
+    return os.getenv("MLFLOW_TRACKING_URI", "http://127.0.0.1:5000")
+
+
+def setup_mlflow():
+    mlflow.set_tracking_uri(get_mlflow_tracking_uri())
+    mlflow.set_experiment("dhaka_city_precipitation_forecast_v9")
+
+
+def training_settings():
+    """
+    Where models are trained and logged: part of the cache key of the
+    training tasks, so switching to distributed training or another MLflow
+    server does not reuse a result (and run_id) from the old setup.
+    """
+    return {
+        "train_workers": get_train_workers(),
+        "dask_scheduler_address": get_dask_scheduler_address(),
+        "mlflow_tracking_uri": get_mlflow_tracking_uri(),
+    }
 
-from utils.config import get_bucket_name, get_sendgrid_block
 
 # ---------------- TASKS ----------------
 
 
-@task(log_prints=True)
+@task(log_prints=True, **cached_task_options(cache_key_fn=gcs_blob_cache_key))
+@instrumented
 def download_from_gcs(blob_name, local_path):
     logger = get_run_logger()
     bucket_name = get_bucket_name()
     storage_client = storage.Client()
     bucket = storage_client.bucket(bucket_name)
-    blob = bucket.blob(blob_name)
+    blob = bucket.get_blob(blob_name)
+    if blob is None:
+        raise FileNotFoundError(f"gs://{bucket_name}/{blob_name} does not exist")
+    if local_copy_matches(blob, local_path):
+        logger.info(f"{local_path} already matches gs://{bucket_name}/{blob_name}")
+        return local_path
     os.makedirs(os.path.dirname(local_path), exist_ok=True)
     blob.download_to_filename(local_path)
+    record_bytes(os.path.getsize(local_path))
     logger.info(f"Downloaded gs://{bucket_name}/{blob_name} to {local_path}")
     return local_path
 
 
-@task(log_prints=True)
+@task(log_prints=True, **cached_task_options())
+@instrumented
 def engineer_features(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
     df["time"] = pd.to_datetime(df["time"])
     df["hour"] = df["time"].dt.hour
@@ -68,45 +140,63 @@ def engineer_features(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
     return X, y
 
 
-@task(log_prints=True)
-def train_model(X, y):
+@task(log_prints=True, **cached_task_options(settings=training_settings))
+@instrumented
+def train_model(X, y, param_grid=PARAM_GRID):
     logger = get_run_logger()
-    tracking_uri = os.getenv("MLFLOW_TRACKING_URI", "http://127.0.0.1:5000")
-    mlflow.set_tracking_uri(tracking_uri)
-    mlflow.set_experiment("dhaka_city_precipitation_forecast_v9")
+    setup_mlflow()
 
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42
     )
 
-    model = xgb.XGBRegressor(objective="reg:squarederror", random_state=42)
-    search = GridSearchCV(
-        model,
-        {
-            "n_estimators": [200],
-            "max_depth": [7],
-            "learning_rate": [0.01],
-            "subsample": [0.8],
-            "colsample_bytree": [0.8],
-        },
-        scoring="neg_mean_absolute_error",
-        cv=2,
-    )
+    n_workers = get_train_workers()
+    scheduler_address = get_dask_scheduler_address()
+    distributed = n_workers > 1 or scheduler_address is not None
 
     with mlflow.start_run() as run:
         run_id = run.info.run_id
-        search.fit(X_train, y_train)
-        best_model = search.best_estimator_
+        if distributed:
+            # Grid search is not distributed; train the first grid point instead.
+            best_params = {k: v[0] for k, v in param_grid.items()}
+            n_points = len(ParameterGrid(param_grid))
+            if n_points > 1:
+                logger.warning(
+                    f"Distributed training does not grid-search: training only "
+                    f"{best_params}, the first of {n_points} grid points. "
+                    f"Set TRAIN_WORKERS=1 without DASK_SCHEDULER_ADDRESS to search it."
+                )
+            logger.info(
+                f"Distributed training on {scheduler_address or f'{n_workers} local workers'}"
+            )
+            best_model = fit_distributed(
+                X_train,
+                y_train,
+                {"objective": "reg:squarederror", "random_state": 42, **best_params},
+                n_workers=n_workers,
+                scheduler_address=scheduler_address,
+            )
+        else:
+            search = GridSearchCV(
+                xgb.XGBRegressor(objective="reg:squarederror", random_state=42),
+                param_grid,
+                scoring="neg_mean_absolute_error",
+                cv=2,
+            )
+            search.fit(X_train, y_train)
+            best_model = search.best_estimator_
+            best_params = search.best_params_
         y_pred = best_model.predict(X_test)
 
         metrics = {
             "mae": mean_absolute_error(y_test, y_pred),
             "mse": mean_squared_error(y_test, y_pred),
             "r2": r2_score(y_test, y_pred),
+            "predict_latency_ms": predict_latency_ms(best_model, X_test),
         }
 
         mlflow.log_metrics(metrics)
-        mlflow.log_params(search.best_params_)
+        mlflow.log_params(best_params)
 
         with open("features.txt", "w") as f:
             f.write("\n".join(X_train.columns))
@@ -133,24 +223,95 @@ def train_model(X, y):
         model_version = registered_model.version
 
     logger.info(f"Logged new model metrics: {metrics}")
-    return metrics, y_pred, model_version
+    return metrics, y_pred, model_version, best_model
+
+
+@task(log_prints=True, **cached_task_options(settings=training_settings))
+@instrumented
+def search_compressed_models(X, y, full_model, grid=COMPRESSION_GRID):
+    """
+    Search smaller versions of the fitted full_model (fewer features,
+    shallower trees, fewer rounds).
+
+    Features are ranked by mean |SHAP| of full_model on a validation split
+    of the training rows, so the test rows that score the candidates play
+    no part in choosing them. Every candidate is scored on backtest MAE and
+    measured predict latency, and the Pareto set is logged to MLflow.
+    Returns the Pareto set, sorted by latency.
+    """
+    logger = get_run_logger()
+    setup_mlflow()
+
+    # Same split as train_model, so full_model never saw X_test
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42
+    )
+    _, X_val = train_test_split(X_train, test_size=0.25, random_state=42)
+    base_params = {k: v for k, v in full_model.get_params().items() if v is not None}
+
+    ranking = rank_features(full_model, X_val)
+    ranked = list(ranking["feature"])
+
+    candidates = []
+    for top_k in grid["top_k_features"]:
+        features = ranked[:top_k] if top_k else list(X.columns)
+        for max_depth in grid["max_depth"]:
+            for n_estimators in grid["n_estimators"]:
+                params = {
+                    **base_params,
+                    "max_depth": max_depth,
+                    "n_estimators": n_estimators,
+                }
+                model = xgb.XGBRegressor(**params).fit(X_train[features], y_train)
+                candidates.append(
+                    {
+                        "n_features": len(features),
+                        "max_depth": max_depth,
+                        "n_estimators": n_estimators,
+                        "mae": mean_absolute_error(
+                            y_test, model.predict(X_test[features])
+                        ),
+                        "latency_ms": predict_latency_ms(model, X_test[features]),
+                        "features": ",".join(features),
+                    }
+                )
+
+    front = pareto_front(candidates)
+
+    with mlflow.start_run(run_name="compression_search"):
+        mlflow.log_params({f"base_{k}": v for k, v in base_params.items()})
+        ranking.to_csv("feature_ranking.csv", index=False)
+        mlflow.log_artifact("feature_ranking.csv")
+        pd.DataFrame(candidates).to_csv("compression_candidates.csv", index=False)
+        mlflow.log_artifact("compression_candidates.csv")
+        pd.DataFrame(front).to_csv("pareto_front.csv", index=False)
+        mlflow.log_artifact("pareto_front.csv")
+        for step, c in enumerate(front):
+            mlflow.log_metrics(
+                {"pareto_mae": c["mae"], "pareto_latency_ms": c["latency_ms"]},
+                step=step,
+            )
+
+    logger.info(
+        f"Compression search: {len(front)} of {len(candidates)} on the Pareto front"
+    )
+    return front
 
 
 @task(log_prints=True)
-def fetch_champion_mae(model_name="dhaka_city_precipitation_xgb"):
+@instrumented
+def fetch_champion_metrics(model_name="dhaka_city_precipitation_xgb"):
     logger = get_run_logger()
-    client = MlflowClient()
 
     try:
-        version = client.get_model_version_by_alias(model_name, "champion")
-        run = client.get_run(version.run_id)
-        return run.data.metrics.get("mae", float("inf"))
+        return model_registry.resolve("champion", model_name)["metrics"]
     except mlflow.exceptions.RestException:
         logger.info("No existing champion. This will be the first one.")
         return None
 
 
 @task(log_prints=True)
+@instrumented
 def push_metrics_to_prometheus(metrics):
     logger = get_run_logger()
     registry = CollectorRegistry()
@@ -159,34 +320,49 @@ def push_metrics_to_prometheus(metrics):
     Gauge("model_r2", "Model R²", registry=registry).set(metrics["r2"])
     Gauge("model_mse", "Model MSE", registry=registry).set(metrics["mse"])
 
-    push_to_gateway(
-        "http://127.0.0.1:9091", job="dhaka_weather_model", registry=registry
-    )
+    push_with_retry(registry, job="dhaka_weather_model")
     logger.info("Metrics pushed to Prometheus via Pushgateway.")
 
 
 @task(log_prints=True)
-def compare_and_update_alias(new_mae, new_version):
+@instrumented
+def compare_and_update_alias(new_mae, new_version, new_latency_ms=None, pareto=None):
     logger = get_run_logger()
-    client = MlflowClient()
-    old_mae = fetch_champion_mae()
+    latency_budget_ms = get_latency_budget_ms()
+    promote, reason = promotion_decision(
+        new_mae, new_latency_ms, fetch_champion_metrics(), latency_budget_ms
+    )
 
-    if old_mae is None or new_mae < old_mae:
-        client.set_registered_model_alias(
-            "dhaka_city_precipitation_xgb", "champion", new_version
-        )
-        logger.info("New model promoted as champion.")
-        return "New model promoted as champion."
+    if promote:
+        model_registry.set_alias("champion", new_version)
+        result = f"New model promoted as champion ({reason})."
     else:
-        logger.info("Old model retained as champion.")
-        return "Old model retained (new model not promoted)."
+        result = f"Old model retained ({reason})."
+        suggestion = (
+            best_within_budget(pareto or [], latency_budget_ms)
+            if latency_budget_ms is not None
+            else None
+        )
+        if suggestion is not None:
+            result += (
+                f" Best compressed candidate within budget: "
+                f"{suggestion['n_features']} features, max_depth={suggestion['max_depth']}, "
+                f"n_estimators={suggestion['n_estimators']} "
+                f"(MAE {suggestion['mae']:.4f}, {suggestion['latency_ms']:.2f} ms)."
+            )
+    logger.info(result)
+    return result
 
 
 # ---------------- FLOW ----------------
 
 
-@flow(name="train_and_compare")
-def train_and_compare():
+@flow(
+    name="train_and_compare",
+    on_completion=[pipeline_metrics_hook],
+    on_failure=[pipeline_metrics_hook],
+)
+def train_and_compare(compress: bool = False):
     logger = get_run_logger()
     flow_start_time = datetime.now()
 
@@ -196,9 +372,15 @@ def train_and_compare():
     df = pd.read_csv(df_path)
 
     X, y = engineer_features(df)
-    metrics_new, _, model_version = train_model(X, y)
-
-    result = compare_and_update_alias(metrics_new["mae"], model_version)
+    metrics_new, _, model_version, model = train_model(X, y)
+    pareto = search_compressed_models(X, y, model) if compress else None
+
+    result = compare_and_update_alias(
+        metrics_new["mae"],
+        model_version,
+        new_latency_ms=metrics_new["predict_latency_ms"],
+        pareto=pareto,
+    )
     push_metrics_to_prometheus(metrics_new)
 
     flow_end_time = datetime.now()
@@ -212,7 +394,8 @@ def train_and_compare():
         f"Model Metrics:\n"
         f" - MAE: {metrics_new['mae']:.4f}\n"
         f" - MSE: {metrics_new['mse']:.4f}\n"
-        f" - R²:  {metrics_new['r2']:.4f}\n\n"
+        f" - R²:  {metrics_new['r2']:.4f}\n"
+        f" - Predict latency: {metrics_new['predict_latency_ms']:.2f} ms\n\n"
         f"Model Selection Result:\n"
         f"{result}\n"
     )
@@ -225,4 +408,15 @@ def train_and_compare():
 
 
 if __name__ == "__main__":
-    train_and_compare()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train and compare models.")
+    parser.add_argument(
+        "--compress", action="store_true", help="Run the model compression search"
+    )
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    if args.profile:
+        enable_task_profiling(args.profile)
+    train_and_compare(compress=args.compress)
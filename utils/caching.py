@@ -0,0 +1,153 @@
+import base64
+import hashlib
+import inspect
+import json
+import os
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils.config import get_bucket_name, get_task_cache_ttl_hours
+
+
+def _update(h, value):
+    if isinstance(value, pd.DataFrame):
+        h.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+        h.update(repr([(str(c), str(t)) for c, t in value.dtypes.items()]).encode())
+    elif isinstance(value, pd.Series):
+        h.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+        h.update(repr((value.name, str(value.dtype))).encode())
+    elif isinstance(value, np.ndarray):
+        h.update(repr((value.shape, str(value.dtype))).encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        h.update(json.dumps(value, sort_keys=True, default=str).encode())
+    elif hasattr(value, "get_booster"):
+        # Fitted XGBoost model: repr() shows only the hyperparameters
+        h.update(bytes(value.get_booster().save_raw()))
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _update(h, item)
+    else:
+        h.update(repr(value).encode())
+
+
+def fingerprint(value):
+    """
+    Content hash of DataFrames, Series, arrays, fitted XGBoost models and
+    plain (nested) values.
+    """
+    h = hashlib.sha256()
+    _update(h, value)
+    return h.hexdigest()
+
+
+def _task_source(context):
+    # Editing a task's code must invalidate its cached results.
+    try:
+        return inspect.getsource(context.task.fn)
+    except (OSError, TypeError):
+        return context.task.name
+
+
+def input_hash_cache_key(context, parameters):
+    """
+    Prefect cache_key_fn: task source plus a content hash of every parameter.
+    """
+    return fingerprint(
+        [_task_source(context)]
+        + [[name, parameters[name]] for name in sorted(parameters)]
+    )
+
+
+def with_settings(cache_key_fn, settings):
+    """
+    Wrap a cache_key_fn so the key also covers settings(), a dict of
+    environment-derived values that change a task's result without being
+    parameters (e.g. where it trains or logs to).
+    """
+
+    def cache_key(context, parameters):
+        key = cache_key_fn(context, parameters)
+        return None if key is None else fingerprint([key, settings()])
+
+    return cache_key
+
+
+def gcs_blob_cache_key(context, parameters):
+    """
+    Prefect cache_key_fn for downloads: the blob's generation plus the target path.
+
+    Returns None (no caching) when the local copy is gone, so a cached path is
+    never handed out for a file that no longer exists.
+    """
+    from google.cloud import storage
+
+    if not os.path.exists(parameters["local_path"]):
+        return None
+
+    bucket_name = get_bucket_name()
+    blob = storage.Client().bucket(bucket_name).get_blob(parameters["blob_name"])
+    if blob is None:
+        return None
+    return fingerprint(
+        [
+            _task_source(context),
+            bucket_name,
+            parameters["blob_name"],
+            blob.generation,
+            parameters["local_path"],
+        ]
+    )
+
+
+def local_copy_matches(blob, local_path):
+    """
+    True if local_path already holds the blob's content (by MD5).
+    """
+    if not blob.md5_hash or not os.path.exists(local_path):
+        return False
+    md5 = hashlib.md5()
+    with open(local_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            md5.update(chunk)
+    return base64.b64encode(md5.digest()).decode() == blob.md5_hash
+
+
+def log_cache_hit(task, task_run, state):
+    """
+    Prefect task on_completion hook that reports cache hits.
+    """
+    if state.name == "Cached":
+        from prefect.logging import get_logger
+
+        get_logger("caching").info(
+            f"Cache hit for task {task.name}, reused persisted result."
+        )
+
+
+def cached_task_options(cache_key_fn=input_hash_cache_key, settings=None):
+    """
+    Common @task options for expensive, deterministic pipeline stages.
+
+    Results are persisted to Prefect's local result storage
+    (PREFECT_RESULTS_LOCAL_STORAGE_PATH, ~/.prefect/storage by default) so
+    reruns and retries reuse them until TASK_CACHE_TTL_HOURS expires.
+    A TTL of 0 disables caching. settings, a callable returning a dict, is
+    folded into the key (see with_settings).
+    """
+    ttl_hours = get_task_cache_ttl_hours()
+    if ttl_hours <= 0:
+        from prefect.cache_policies import NO_CACHE
+
+        return {"cache_policy": NO_CACHE}
+
+    if settings is not None:
+        cache_key_fn = with_settings(cache_key_fn, settings)
+    return {
+        "cache_key_fn": cache_key_fn,
+        "cache_expiration": timedelta(hours=ttl_hours),
+        "persist_result": True,
+        "on_completion": [log_cache_hit],
+    }
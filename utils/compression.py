@@ -0,0 +1,100 @@
+import time
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+
+def predict_latency_ms(model, X, batch_size=24, repeats=30):
+    """
+    Median wall time (ms) of model.predict on a serving-sized batch of X.
+    """
+    batch = X.iloc[:batch_size]
+    model.predict(batch)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(batch)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1e3)
+
+
+def rank_features(model, X, sample_size=2000):
+    """
+    Rank features by mean |SHAP| contribution on a sample of X, with total gain.
+    """
+    booster = model.get_booster()
+    sample = X.iloc[:sample_size]
+    contribs = booster.predict(xgb.DMatrix(sample), pred_contribs=True)
+    gain = booster.get_score(importance_type="total_gain")
+
+    ranking = pd.DataFrame(
+        {
+            "feature": list(sample.columns),
+            "mean_abs_shap": np.abs(contribs[:, :-1]).mean(axis=0),  # last = bias
+            "total_gain": [gain.get(c, 0.0) for c in sample.columns],
+        }
+    )
+    return ranking.sort_values(
+        ["mean_abs_shap", "total_gain"], ascending=False
+    ).reset_index(drop=True)
+
+
+def pareto_front(candidates, objectives=("mae", "latency_ms")):
+    """
+    Candidates not dominated on any objective (all minimized).
+    """
+    front = []
+    for c in candidates:
+        dominated = any(
+            all(o[k] <= c[k] for k in objectives)
+            and any(o[k] < c[k] for k in objectives)
+            for o in candidates
+        )
+        if not dominated:
+            front.append(c)
+    return sorted(front, key=lambda c: c[objectives[1]])
+
+
+def best_within_budget(front, latency_budget_ms):
+    """
+    Lowest-MAE Pareto candidate whose latency fits the budget, or None.
+    """
+    fitting = [c for c in front if c["latency_ms"] <= latency_budget_ms]
+    return min(fitting, key=lambda c: c["mae"]) if fitting else None
+
+
+def promotion_decision(new_mae, new_latency_ms, champion_metrics, latency_budget_ms):
+    """
+    Decide whether a new model replaces the champion; returns (promote, reason).
+
+    Without a champion the new model is always promoted, so the registry
+    never lacks one. The latency budget only guards an existing champion:
+    a candidate over budget is kept out, unless the champion is over budget
+    as well and the candidate is no slower (then MAE decides). Otherwise the
+    lower MAE wins.
+    """
+    if champion_metrics is None:
+        return True, "no existing champion"
+
+    champion_latency = champion_metrics.get("predict_latency_ms")
+    if (
+        latency_budget_ms is not None
+        and new_latency_ms is not None
+        and new_latency_ms > latency_budget_ms
+    ):
+        if champion_latency is None or champion_latency <= latency_budget_ms:
+            return False, (
+                f"predict latency {new_latency_ms:.2f} ms exceeds the "
+                f"{latency_budget_ms:.2f} ms budget"
+            )
+        if new_latency_ms > champion_latency:
+            return False, (
+                f"predict latency {new_latency_ms:.2f} ms exceeds the budget and "
+                f"the champion's {champion_latency:.2f} ms"
+            )
+
+    champion_mae = champion_metrics.get("mae", float("inf"))
+    if new_mae < champion_mae:
+        return True, f"MAE {new_mae:.4f} < champion's {champion_mae:.4f}"
+    return False, f"MAE {new_mae:.4f} >= champion's {champion_mae:.4f}"
@@ -1,5 +1,6 @@
 # utils/config.py
 import os
+import tempfile
 
 
 def get_bucket_name(default="mlops-zoomcamp-bucket-51"):
@@ -8,3 +9,172 @@ def get_bucket_name(default="mlops-zoomcamp-bucket-51"):
 
 def get_sendgrid_block(default="sendgrid-notification"):
     return os.getenv("GET_SENDGRID_BLOCK", default)
+
+
+def get_train_workers(default=1):
+    return int(os.getenv("TRAIN_WORKERS", default))
+
+
+def get_dask_scheduler_address(default=None):
+    return os.getenv("DASK_SCHEDULER_ADDRESS", default)
+
+
+def get_pushgateway_url(default="127.0.0.1:9091"):
+    return os.getenv("PUSHGATEWAY_URL", default)
+
+
+def get_task_cache_ttl_hours(default=48):
+    return float(os.getenv("TASK_CACHE_TTL_HOURS", default))
+
+
+def get_registry_cache_ttl(default=300):
+    return float(os.getenv("REGISTRY_CACHE_TTL_SECONDS", default))
+
+
+def get_forecast_locations(default="dhaka:23.8103:90.4125"):
+    """
+    Locations to precompute, as FORECAST_LOCATIONS="name:lat:lon,name:lat:lon".
+    """
+    locations = {}
+    for item in os.getenv("FORECAST_LOCATIONS", default).split(","):
+        name, lat, lon = item.strip().split(":")
+        locations[name] = (float(lat), float(lon))
+    return locations
+
+
+def get_forecast_store_dir(default="/tmp/forecast-store"):
+    return os.getenv("FORECAST_STORE_DIR", default)
+
+
+def get_forecast_cache_url(default=None):
+    return os.getenv("FORECAST_CACHE_URL", default)
+
+
+def get_forecast_cache_ttl(default=86400):
+    return float(os.getenv("FORECAST_CACHE_TTL_SECONDS", default))
+
+
+def get_forecast_lock_ttl(default=30):
+    return float(os.getenv("FORECAST_LOCK_TTL_SECONDS", default))
+
+
+def get_precompute_interval(default=3600):
+    return float(os.getenv("FORECAST_PRECOMPUTE_INTERVAL_SECONDS", default))
+
+
+def get_forecast_max_age(default=5400):
+    return float(os.getenv("FORECAST_MAX_AGE_SECONDS", default))
+
+
+def get_challenger_alias(default=None):
+    return os.getenv("SHADOW_CHALLENGER_ALIAS", default)
+
+
+def get_shadow_queue_size(default=8):
+    return int(os.getenv("SHADOW_QUEUE_SIZE", default))
+
+
+def get_shadow_drain_timeout(default=120):
+    return float(os.getenv("SHADOW_DRAIN_TIMEOUT_SECONDS", default))
+
+
+def get_shadow_log_path(default="/tmp/shadow_predictions.jsonl"):
+    return os.getenv("SHADOW_LOG_PATH", default)
+
+
+def get_latency_budget_ms(default=None):
+    """
+    Max predict latency (ms, 24-row batch) a model may have to be promoted.
+    """
+    value = os.getenv("MAX_PREDICT_LATENCY_MS", default)
+    return None if value is None else float(value)
+
+
+def get_profile_dir(default="/tmp/profiles"):
+    return os.getenv("PROFILE_DIR", default)
+
+
+def get_profile_sample_rate(default=0.0):
+    return float(os.getenv("PROFILE_SAMPLE_RATE", default))
+
+
+def get_tracemalloc_enabled(default="0"):
+    return os.getenv("PROFILE_TRACEMALLOC", default) == "1"
+
+
+def get_task_profile_dir(default=None):
+    return os.getenv("PROFILE_TASKS_DIR", default)
+
+
+def get_admin_token(default=None):
+    return os.getenv("ADMIN_TOKEN", default)
+
+
+def get_prediction_history_dir(default="/tmp/prediction-history"):
+    return os.getenv("PREDICTION_HISTORY_DIR", default)
+
+
+def get_prediction_history_url(default=None):
+    return os.getenv("PREDICTION_HISTORY_URL", default)
+
+
+def get_history_retention_days(default=730):
+    return float(os.getenv("PREDICTION_HISTORY_RETENTION_DAYS", default))
+
+
+def get_history_compact_after_days(default=62):
+    return float(os.getenv("PREDICTION_HISTORY_COMPACT_AFTER_DAYS", default))
+
+
+def get_rate_limit_db(
+    default=os.path.join(tempfile.gettempdir(), "open_meteo_ratelimit.sqlite3")
+):
+    return os.getenv("OPEN_METEO_RATE_LIMIT_DB", default)
+
+
+def get_rate_limit_url(default=None):
+    return os.getenv("OPEN_METEO_RATE_LIMIT_URL", default)
+
+
+def get_open_meteo_budgets(
+    default="serving:300/minute:3000/day,batch:200/minute:6000/day",
+):
+    """
+    Open-Meteo call budgets, as OPEN_METEO_BUDGETS="name:limit/window:...,name:...".
+
+    Windows are second, minute, hour or day. Returns {name: {window: limit}}.
+    """
+    budgets = {}
+    for item in os.getenv("OPEN_METEO_BUDGETS", default).split(","):
+        name, *limits = item.strip().split(":")
+        budgets[name] = {}
+        for limit in limits:
+            calls, window = limit.split("/")
+            budgets[name][window] = int(calls)
+    return budgets
+
+
+def get_open_meteo_wait(budget):
+    """
+    Longest a call of this budget may wait for a token (OPEN_METEO_<BUDGET>_WAIT_SECONDS).
+    """
+    defaults = {"serving": 5, "batch": 900}
+    return float(
+        os.getenv(f"OPEN_METEO_{budget.upper()}_WAIT_SECONDS", defaults.get(budget, 60))
+    )
+
+
+def get_predict_max_concurrency(default=8):
+    return int(os.getenv("PREDICT_MAX_CONCURRENCY", default))
+
+
+def get_predict_max_queue(default=32):
+    return int(os.getenv("PREDICT_MAX_QUEUE", default))
+
+
+def get_predict_max_queue_wait(default=2):
+    return float(os.getenv("PREDICT_MAX_QUEUE_WAIT_SECONDS", default))
+
+
+def get_predict_retry_after(default=1):
+    return int(os.getenv("PREDICT_RETRY_AFTER_SECONDS", default))
@@ -0,0 +1,49 @@
+import xgboost as xgb
+
+
+def fit_distributed(X, y, params, n_workers=2, scheduler_address=None):
+    """
+    Train an XGBRegressor with xgboost's collective (allreduce) over Dask workers.
+
+    The feature data is sharded into one partition per worker. When
+    scheduler_address is set the job runs on that (possibly multi-node) Dask
+    cluster, otherwise a LocalCluster with n_workers processes is started on
+    this machine. Returns a plain xgb.XGBRegressor so callers can predict and
+    log it exactly like a single-process model.
+    """
+    try:
+        import dask.dataframe as dd
+        from dask.distributed import Client, LocalCluster
+        from xgboost import dask as dxgb
+    except ImportError as e:
+        raise ImportError(
+            "Distributed training requires dask: pip install 'dask[distributed]'"
+        ) from e
+
+    if scheduler_address:
+        cluster = None
+        client = Client(scheduler_address)
+    else:
+        cluster = LocalCluster(
+            n_workers=n_workers, threads_per_worker=1, processes=True
+        )
+        client = Client(cluster)
+
+    try:
+        n_shards = max(len(client.scheduler_info()["workers"]), 1)
+        dX = dd.from_pandas(X, npartitions=n_shards)
+        dy = dd.from_pandas(y, npartitions=n_shards)
+        dX, dy = client.persist([dX, dy])
+
+        model = dxgb.DaskXGBRegressor(**params)
+        model.client = client
+        model.fit(dX, dy)
+        booster = model.get_booster()
+    finally:
+        client.close()
+        if cluster is not None:
+            cluster.close()
+
+    regressor = xgb.XGBRegressor(**params)
+    regressor.load_model(bytearray(booster.save_raw(raw_format="json")))
+    return regressor
@@ -0,0 +1,219 @@
+import functools
+import resource
+import threading
+import time
+from contextvars import ContextVar
+
+from utils.config import get_pushgateway_url
+from utils.profiling import profile_task
+
+# Task records collected during the current flow run (one flow run per process).
+_records = []
+_counters = {}
+_lock = threading.Lock()
+_current = ContextVar("instrumented_task", default=None)
+
+TASK_METRICS = {
+    "calls": "Number of task runs",
+    "wall_seconds": "Wall-clock time spent in the task",
+    "cpu_seconds": "Process CPU time spent in the task",
+    "peak_rss_bytes": "Peak resident set size of the process during the task",
+    "rows": "Rows processed by the task",
+    "bytes": "Bytes read, written or transferred by the task",
+    "failures": "Number of failed task runs",
+}
+
+
+def _reset_peak_rss():
+    """
+    Reset the kernel's RSS high-water mark (Linux >= 4.0); False if unsupported.
+
+    The counter is per process, so tasks running concurrently in threads
+    reset it for each other and report the peak since the latest start.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_bytes(since_reset):
+    if since_reset:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    # Process-lifetime peak; ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _count_rows(value):
+    if isinstance(value, tuple):
+        return _count_rows(value[0]) if value else 0
+    shape = getattr(value, "shape", None)
+    if shape:
+        return int(shape[0])
+    return 0
+
+
+def record_bytes(n):
+    """
+    Add n bytes transferred to the instrumented task currently running, if any.
+    """
+    record = _current.get()
+    if record is not None:
+        record["bytes"] += int(n)
+
+
+def record_rows(n):
+    """
+    Override the row count of the instrumented task currently running, if any.
+    """
+    record = _current.get()
+    if record is not None:
+        record["rows"] = int(n)
+
+
+def count_flow_event(name, n=1):
+    """
+    Increment a flow-level counter, pushed as pipeline_flow_<name>.
+    """
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def instrumented(fn):
+    """
+    Record wall time, CPU time, peak RSS, rows and bytes for every call of fn.
+
+    Rows default to the length of the returned DataFrame/array (or the first
+    element of a returned tuple); tasks can refine them with record_rows()
+    and report I/O with record_bytes(). With task profiling enabled each call
+    also writes a cProfile report. Place it below @task.
+
+    Peak RSS is reset at the start of each call, but the counter is per
+    process: tasks running concurrently (e.g. .map on the thread-pool task
+    runner) reset each other's peak, so their per-task values are unreliable.
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        record = {"task": fn.__name__, "rows": None, "bytes": 0, "failed": False}
+        token = _current.set(record)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        peak_reset = _reset_peak_rss()
+        try:
+            with profile_task(fn.__name__):
+                result = fn(*args, **kwargs)
+            if record["rows"] is None:
+                record["rows"] = _count_rows(result)
+            return result
+        except Exception:
+            record["failed"] = True
+            raise
+        finally:
+            _current.reset(token)
+            record["wall_seconds"] = time.perf_counter() - wall_start
+            record["cpu_seconds"] = time.process_time() - cpu_start
+            record["peak_rss_bytes"] = _peak_rss_bytes(peak_reset)
+            record["rows"] = record["rows"] or 0
+            with _lock:
+                _records.append(record)
+
+    return wrapper
+
+
+def summarize_records(records):
+    """
+    Aggregate task records per task name (mapped tasks run many times).
+    """
+    summary = {}
+    for record in records:
+        task = summary.setdefault(record["task"], dict.fromkeys(TASK_METRICS, 0))
+        task["calls"] += 1
+        task["failures"] += int(record["failed"])
+        task["wall_seconds"] += record["wall_seconds"]
+        task["cpu_seconds"] += record["cpu_seconds"]
+        task["rows"] += record["rows"]
+        task["bytes"] += record["bytes"]
+        task["peak_rss_bytes"] = max(task["peak_rss_bytes"], record["peak_rss_bytes"])
+    return summary
+
+
+def push_with_retry(registry, job, grouping_key=None, retries=3, backoff=1.0):
+    """
+    Push a registry to the Pushgateway, retrying with exponential backoff.
+    """
+    from prometheus_client import push_to_gateway
+
+    for attempt in range(retries):
+        try:
+            push_to_gateway(
+                get_pushgateway_url(),
+                job=job,
+                registry=registry,
+                grouping_key=grouping_key or {},
+                timeout=10,
+            )
+            return
+        except OSError:
+            if attempt == retries - 1:
+                raise
+            time.sleep(backoff * 2**attempt)
+
+
+def push_pipeline_metrics(flow_name, extra=None):
+    """
+    Push all task records of this flow run in one Pushgateway update.
+
+    extra is an optional {name: value} dict of flow-level gauges, added to
+    the counters collected with count_flow_event().
+    """
+    from prometheus_client import CollectorRegistry, Gauge
+
+    with _lock:
+        records = list(_records)
+        _records.clear()
+        flow_values = {**_counters, **(extra or {})}
+        _counters.clear()
+
+    registry = CollectorRegistry()
+    for name, value in flow_values.items():
+        Gauge(f"pipeline_flow_{name}", name, registry=registry).set(value)
+    Gauge(
+        "pipeline_flow_last_run_timestamp_seconds",
+        "Time the flow run finished",
+        registry=registry,
+    ).set_to_current_time()
+
+    gauges = {
+        name: Gauge(f"pipeline_task_{name}", doc, ["task"], registry=registry)
+        for name, doc in TASK_METRICS.items()
+    }
+    for task, values in summarize_records(records).items():
+        for name, value in values.items():
+            gauges[name].labels(task=task).set(value)
+
+    push_with_retry(
+        registry, job="pipeline_performance", grouping_key={"flow": flow_name}
+    )
+    return len(records)
+
+
+def pipeline_metrics_hook(flow, flow_run, state):
+    """
+    Prefect on_completion/on_failure hook that pushes the flow run's task metrics.
+    """
+    from prefect.logging import get_logger
+
+    logger = get_logger("instrumentation")
+    try:
+        n = push_pipeline_metrics(
+            flow.name, extra={"success": int(state.is_completed())}
+        )
+        logger.info(f"Pushed pipeline metrics for {n} task runs of {flow.name}.")
+    except OSError as e:
+        logger.error(f"Failed to push pipeline metrics for {flow.name}: {e}")
@@ -0,0 +1,187 @@
+import cProfile
+import functools
+import io
+import itertools
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+from utils.config import (
+    get_profile_dir,
+    get_profile_sample_rate,
+    get_task_profile_dir,
+    get_tracemalloc_enabled,
+)
+
+logger = logging.getLogger(__name__)
+
+# Runtime-adjustable settings (the admin endpoint and --profile change them)
+settings = {
+    "sample_rate": get_profile_sample_rate(),
+    "tracemalloc": get_tracemalloc_enabled(),
+    "task_profile_dir": get_task_profile_dir(),
+}
+_sequence = itertools.count()
+_tracemalloc_lock = threading.Lock()
+_active = threading.local()
+
+
+def _output_path(directory, name, suffix):
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    return os.path.join(directory, f"{name}-{stamp}-{next(_sequence)}.{suffix}")
+
+
+class StackSampler:
+    """
+    Sample one thread's Python stack at a fixed interval from a helper thread.
+
+    Stacks are kept in collapsed ("folded") form, root first, which
+    flamegraph.pl, speedscope and inferno read directly.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+                )
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def write_folded(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def sampled_profile(name):
+    """
+    Decorator: profile a `settings["sample_rate"]` fraction of calls with a
+    StackSampler and write <PROFILE_DIR>/<name>-*.folded.
+
+    Apply to sync FastAPI endpoints; they run in a worker thread, which is the
+    thread that gets sampled.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if random.random() >= settings["sample_rate"]:
+                return fn(*args, **kwargs)
+            sampler = StackSampler(threading.get_ident())
+            try:
+                with sampler:
+                    return fn(*args, **kwargs)
+            finally:
+                sampler.write_folded(_output_path(get_profile_dir(), name, "folded"))
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def trace_memory(label, top=20):
+    """
+    Take tracemalloc snapshots around a block when PROFILE_TRACEMALLOC is on.
+
+    Writes the top allocation differences and the traced peak to
+    <PROFILE_DIR>/<label>-*.tracemalloc.txt. Traced blocks are serialized,
+    since tracing is process-wide.
+    """
+    if not settings["tracemalloc"]:
+        yield
+        return
+
+    with _tracemalloc_lock:
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        try:
+            yield
+        finally:
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_here:
+                tracemalloc.stop()
+        stats = after.compare_to(before, "lineno")[:top]
+        with open(_output_path(get_profile_dir(), label, "tracemalloc.txt"), "w") as f:
+            f.write(f"{label}: traced peak {peak / 1024:.1f} KiB\n")
+            for stat in stats:
+                f.write(f"{stat}\n")
+
+
+@contextmanager
+def profile_task(name, top=30):
+    """
+    cProfile a task when task profiling is enabled (--profile or PROFILE_TASKS_DIR).
+
+    Writes <dir>/<name>-*.pstats and a cumulative-time text report next to it.
+    A task called from another profiled task is part of the outer report.
+    """
+    directory = settings["task_profile_dir"]
+    if not directory or getattr(_active, "profiling", False):
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    _active.profiling = True
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _active.profiling = False
+        path = _output_path(directory, name, "pstats")
+        profiler.dump_stats(path)
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(top)
+        with open(path[: -len(".pstats")] + ".txt", "w") as f:
+            f.write(report.getvalue())
+
+
+def enable_task_profiling(directory):
+    settings["task_profile_dir"] = directory
+    logger.info(f"Task profiling enabled, writing reports to {directory}")
+
+
+def add_profile_argument(parser):
+    """
+    Add the shared --profile [DIR] flag to a flow entry point's parser.
+    """
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=get_profile_dir(),
+        metavar="DIR",
+        help="Write a cProfile/pstats report per task to DIR",
+    )
@@ -0,0 +1,337 @@
+import functools
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from utils.config import (
+    get_open_meteo_budgets,
+    get_open_meteo_wait,
+    get_rate_limit_db,
+    get_rate_limit_url,
+)
+from utils.instrumentation import count_flow_event
+
+WINDOWS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+QUOTA_REMAINING = Gauge(
+    "open_meteo_quota_remaining",
+    "Open-Meteo calls left in a budget window",
+    ["budget", "window"],
+)
+THROTTLE_WAIT = Histogram(
+    "open_meteo_throttle_wait_seconds",
+    "Time an Open-Meteo call waited for a token",
+    ["budget"],
+    buckets=(0, 0.01, 0.1, 0.5, 1, 2.5, 5, 15, 60, 300, 900),
+)
+THROTTLE_TIMEOUTS = Counter(
+    "open_meteo_throttle_timeouts_total",
+    "Open-Meteo calls abandoned because no token came in time",
+    ["budget"],
+)
+
+
+class RateLimitTimeout(RuntimeError):
+    def __init__(self, budget, retry_after):
+        super().__init__(
+            f"Open-Meteo '{budget}' budget exhausted, retry in {retry_after:.0f}s"
+        )
+        self.budget = budget
+        self.retry_after = retry_after
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets per budget, stored by a subclass so that several processes share them.
+
+    Each budget has one bucket per window (e.g. 300/minute and 3000/day);
+    a call takes a token from all of them. Buckets refill continuously and
+    start full. While a call of the `priority` budget is waiting, other
+    budgets hold back so serving is not starved by a backfill. Waiter entries
+    expire after a few seconds, so a crashed process cannot block batch work.
+
+    Subclasses implement _try_acquire (one atomic attempt, returning
+    (acquired, seconds to wait)), _leave and _tokens.
+    """
+
+    def __init__(self, budgets, priority="serving", poll_interval=0.5):
+        self.budgets = budgets
+        self.priority = priority
+        self.poll_interval = poll_interval
+
+    def _try_acquire(self, budget, waiter_id):
+        raise NotImplementedError
+
+    def _leave(self, waiter_id):
+        raise NotImplementedError
+
+    def _tokens(self, budget):
+        raise NotImplementedError
+
+    def _publish(self, budget, tokens):
+        for window, t in tokens.items():
+            QUOTA_REMAINING.labels(budget, window).set(int(t))
+
+    def acquire(self, budget, timeout=None):
+        """
+        Block until `budget` has a token and take it; returns the seconds waited.
+
+        Raises RateLimitTimeout when no token is available within `timeout`
+        seconds (default OPEN_METEO_<BUDGET>_WAIT_SECONDS).
+        """
+        if budget not in self.budgets:
+            raise KeyError(f"Unknown Open-Meteo budget '{budget}'")
+        timeout = get_open_meteo_wait(budget) if timeout is None else timeout
+
+        waiter_id = uuid.uuid4().hex
+        start = time.monotonic()
+        while True:
+            acquired, wait = self._try_acquire(budget, waiter_id)
+            waited = time.monotonic() - start
+            if acquired:
+                THROTTLE_WAIT.labels(budget).observe(waited)
+                count_flow_event("open_meteo_throttle_wait_seconds", waited)
+                return waited
+
+            remaining = timeout - waited
+            if wait > remaining:
+                self._leave(waiter_id)
+                THROTTLE_TIMEOUTS.labels(budget).inc()
+                count_flow_event("open_meteo_throttle_timeouts")
+                raise RateLimitTimeout(budget, wait)
+            time.sleep(min(wait, remaining, self.poll_interval))
+
+    def remaining(self, budget):
+        """
+        Tokens left per window, without taking one.
+        """
+        tokens = self._tokens(budget)
+        self._publish(budget, tokens)
+        return tokens
+
+
+class SharedRateLimiter(TokenBucketLimiter):
+    """
+    Token buckets shared by every process on the host through one SQLite file.
+    """
+
+    def __init__(self, path, budgets, priority="serving", poll_interval=0.5):
+        super().__init__(budgets, priority, poll_interval)
+        self.path = path
+        with self._transaction() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "budget TEXT, window TEXT, tokens REAL, updated REAL, "
+                "PRIMARY KEY (budget, window))"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS waiters (id TEXT PRIMARY KEY, budget TEXT, expires REAL)"
+            )
+
+    @contextmanager
+    def _transaction(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def _refill(self, db, budget, now):
+        tokens = {}
+        for window, limit in self.budgets[budget].items():
+            row = db.execute(
+                "SELECT tokens, updated FROM buckets WHERE budget = ? AND window = ?",
+                (budget, window),
+            ).fetchone()
+            if row is None:
+                tokens[window] = float(limit)
+            else:
+                rate = limit / WINDOWS[window]
+                tokens[window] = min(limit, row[0] + (now - row[1]) * rate)
+        return tokens
+
+    def _save(self, db, budget, tokens, now):
+        db.executemany(
+            "INSERT OR REPLACE INTO buckets (budget, window, tokens, updated) VALUES (?, ?, ?, ?)",
+            [(budget, window, t, now) for window, t in tokens.items()],
+        )
+
+    def _try_acquire(self, budget, waiter_id):
+        """
+        One attempt in a write transaction; returns (acquired, seconds to wait).
+        """
+        with self._transaction() as db:
+            now = time.time()
+            db.execute("DELETE FROM waiters WHERE expires < ?", (now,))
+
+            yielding = (
+                budget != self.priority
+                and db.execute(
+                    "SELECT COUNT(*) FROM waiters WHERE budget = ?", (self.priority,)
+                ).fetchone()[0]
+                > 0
+            )
+            tokens = self._refill(db, budget, now)
+
+            if not yielding and all(t >= 1 for t in tokens.values()):
+                tokens = {window: t - 1 for window, t in tokens.items()}
+                self._save(db, budget, tokens, now)
+                db.execute("DELETE FROM waiters WHERE id = ?", (waiter_id,))
+                self._publish(budget, tokens)
+                return True, 0.0
+
+            if budget == self.priority:
+                db.execute(
+                    "INSERT OR REPLACE INTO waiters (id, budget, expires) VALUES (?, ?, ?)",
+                    (waiter_id, budget, now + 10 * self.poll_interval),
+                )
+            wait = max(
+                (
+                    (1 - t) * WINDOWS[window] / self.budgets[budget][window]
+                    for window, t in tokens.items()
+                    if t < 1
+                ),
+                default=self.poll_interval,
+            )
+            return False, wait
+
+    def _leave(self, waiter_id):
+        with self._transaction() as db:
+            db.execute("DELETE FROM waiters WHERE id = ?", (waiter_id,))
+
+    def _tokens(self, budget):
+        with self._transaction() as db:
+            return self._refill(db, budget, time.time())
+
+
+# Refill and take every window of a budget in one step, on the server's clock,
+# so hosts with skewed clocks share the same buckets. ARGV[4] = "0" only reads.
+TAKE_TOKEN = """
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1e6
+redis.call("ZREMRANGEBYSCORE", KEYS[2], "-inf", now)
+local take = ARGV[4] == "1"
+local yielding = take and ARGV[2] == "0" and redis.call("ZCARD", KEYS[2]) > 0
+
+local windows, wait, ttl = {}, 0, 0
+for i = 5, #ARGV, 3 do
+    local window, limit, seconds = ARGV[i], tonumber(ARGV[i + 1]), tonumber(ARGV[i + 2])
+    local state = redis.call("HMGET", KEYS[1], window .. ":tokens", window .. ":updated")
+    local tokens = limit
+    if state[1] then
+        tokens = math.min(limit, tonumber(state[1]) + (now - tonumber(state[2])) * limit / seconds)
+    end
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) * seconds / limit)
+    end
+    ttl = math.max(ttl, seconds)
+    windows[#windows + 1] = {window, tokens}
+end
+
+local acquired = take and not yielding and wait == 0
+local result = {acquired and 1 or 0, tostring(wait)}
+for _, w in ipairs(windows) do
+    if acquired then
+        w[2] = w[2] - 1
+        redis.call("HSET", KEYS[1], w[1] .. ":tokens", tostring(w[2]), w[1] .. ":updated", tostring(now))
+    end
+    result[#result + 1] = w[1]
+    result[#result + 1] = tostring(w[2])
+end
+if acquired then
+    -- A full bucket needs no state; drop it once every window has refilled
+    redis.call("EXPIRE", KEYS[1], math.ceil(ttl))
+    redis.call("ZREM", KEYS[2], ARGV[1])
+elseif take and ARGV[2] == "1" then
+    redis.call("ZADD", KEYS[2], now + tonumber(ARGV[3]), ARGV[1])
+    redis.call("EXPIRE", KEYS[2], math.ceil(tonumber(ARGV[3])))
+end
+return result
+"""
+
+
+class RedisRateLimiter(TokenBucketLimiter):
+    """
+    The same token buckets, shared across hosts through a Redis-protocol server.
+
+    Lets the Cloud Run replicas and the Prefect VM draw from one quota. Each
+    budget is a hash of per-window (tokens, updated) fields, and waiting
+    priority calls are members of a sorted set scored by expiry.
+    """
+
+    def __init__(
+        self, url, budgets, priority="serving", poll_interval=0.5, prefix="ratelimit:"
+    ):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError(
+                "A redis:// rate limiter requires redis-py: pip install redis"
+            ) from e
+
+        super().__init__(budgets, priority, poll_interval)
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._take = self.client.register_script(TAKE_TOKEN)
+
+    def _call(self, budget, waiter_id, take):
+        args = [
+            waiter_id,
+            int(budget == self.priority),
+            10 * self.poll_interval,
+            int(take),
+        ]
+        for window, limit in self.budgets[budget].items():
+            args += [window, limit, WINDOWS[window]]
+        result = self._take(
+            keys=[f"{self.prefix}{budget}", f"{self.prefix}waiters:{self.priority}"],
+            args=args,
+        )
+        tokens = {
+            window.decode(): float(t) for window, t in zip(result[2::2], result[3::2])
+        }
+        return bool(result[0]), float(result[1]), tokens
+
+    def _try_acquire(self, budget, waiter_id):
+        acquired, wait, tokens = self._call(budget, waiter_id, take=True)
+        if acquired:
+            self._publish(budget, tokens)
+            return True, 0.0
+        return False, wait or self.poll_interval
+
+    def _leave(self, waiter_id):
+        self.client.zrem(f"{self.prefix}waiters:{self.priority}", waiter_id)
+
+    def _tokens(self, budget):
+        return self._call(budget, "", take=False)[2]
+
+
+def make_rate_limiter(url, path, budgets):
+    """
+    Limiter for OPEN_METEO_RATE_LIMIT_URL: unset means the SQLite file at path
+    (shared on one host), "redis://..." a Redis server shared across hosts.
+    """
+    if not url:
+        return SharedRateLimiter(path, budgets)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisRateLimiter(url, budgets)
+    raise ValueError(f"Unsupported OPEN_METEO_RATE_LIMIT_URL '{url}'")
+
+
+@functools.lru_cache(maxsize=None)
+def get_open_meteo():
+    """
+    The Open-Meteo limiter of this process, built on first use from the environment.
+    """
+    return make_rate_limiter(
+        get_rate_limit_url(), get_rate_limit_db(), get_open_meteo_budgets()
+    )
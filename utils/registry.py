@@ -0,0 +1,81 @@
+import threading
+import time
+
+from utils.config import get_registry_cache_ttl
+from utils.instrumentation import count_flow_event
+
+MODEL_NAME = "dhaka_city_precipitation_xgb"
+
+
+class ModelRegistry:
+    """
+    MLflow model registry client with a TTL cache of alias -> version -> run.
+
+    resolve() returns the version, run metrics and artifact locations of an
+    alias in one lookup (two MLflow calls on a miss, none on a hit). Every
+    MLflow call is counted in `calls` and in the flow's pipeline metrics.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, tracking_uri=None, ttl_seconds=None):
+        self.model_name = model_name
+        self.tracking_uri = tracking_uri
+        self.ttl_seconds = (
+            get_registry_cache_ttl() if ttl_seconds is None else ttl_seconds
+        )
+        self.calls = 0
+        self._client = None
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            from mlflow.tracking import MlflowClient
+
+            self._client = MlflowClient(tracking_uri=self.tracking_uri)
+        return self._client
+
+    def _call(self, method, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+        count_flow_event("registry_calls")
+        return getattr(self.client, method)(*args, **kwargs)
+
+    def resolve(self, alias="champion", model_name=None):
+        """
+        Return {"version", "run_id", "metrics", "params", "model_uri",
+        "artifact_uri"} for the model version behind alias.
+        """
+        key = (model_name or self.model_name, alias)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > now:
+                return cached[1]
+
+        version = self._call("get_model_version_by_alias", key[0], alias)
+        run = self._call("get_run", version.run_id)
+        info = {
+            "version": str(version.version),
+            "run_id": version.run_id,
+            "metrics": dict(run.data.metrics),
+            "params": dict(run.data.params),
+            "model_uri": f"runs:/{version.run_id}/model",
+            "artifact_uri": run.info.artifact_uri,
+        }
+
+        with self._lock:
+            self._cache[key] = (now + self.ttl_seconds, info)
+        return info
+
+    def invalidate(self, alias=None, model_name=None):
+        with self._lock:
+            if alias is None:
+                self._cache.clear()
+            else:
+                self._cache.pop((model_name or self.model_name, alias), None)
+
+    def set_alias(self, alias, version, model_name=None):
+        model_name = model_name or self.model_name
+        self._call("set_registered_model_alias", model_name, alias, str(version))
+        self.invalidate(alias, model_name)